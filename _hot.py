@@ -0,0 +1,72 @@
+"""
+Hot-path helpers for the Nova Educational Bot.
+Request classification and history formatting that run on every turn.
+
+Kept free of third-party imports and fully annotated so the module can be
+compiled with mypyc (`mypyc _hot.py`); the plain Python module is used when
+no compiled build is present.
+"""
+
+import re
+from typing import Dict, Final, FrozenSet, Iterable, List, Tuple
+
+
+# Keywords used to classify requests, by category
+REQUEST_KEYWORDS: Final[Dict[str, Tuple[str, ...]]] = {
+    "quiz": ('quiz', 'test me', 'practice questions', 'questions about', 'test my knowledge'),
+    "flash": ('flashcard', 'flash card', 'study cards', 'vocabulary cards', 'create cards'),
+    "video": ('video', 'youtube', 'watch', 'tutorial video', 'show me a video'),
+    "calc": ('calculate', 'compute', 'what is', 'solve', 'equals'),
+    "search": ('who is', 'what is', 'where is', 'when did', 'how did', 'tell me about', 'explain'),
+}
+
+# One bit per request category, in REQUEST_KEYWORDS order
+QUIZ: Final = 1
+FLASH: Final = 2
+VIDEO: Final = 4
+CALC: Final = 8
+SEARCH: Final = 16
+CATEGORY_BITS: Final[Dict[str, int]] = {
+    "quiz": QUIZ, "flash": FLASH, "video": VIDEO, "calc": CALC, "search": SEARCH,
+}
+
+NO_CONTEXT: Final = 'This is the start of our conversation.'
+
+# Words that make a request lean on the earlier conversation ("tell me more about it")
+FOLLOW_UP_WORDS: Final[FrozenSet[str]] = frozenset({
+    'it', 'its', 'he', 'him', 'his', 'she', 'her', 'they', 'them', 'their',
+    'this', 'that', 'these', 'those', 'more', 'again', 'another', 'else',
+    'also', 'same', 'previous', 'above', 'earlier', 'continue', 'elaborate',
+})
+_WORD_RE: Final = re.compile(r"[a-z]+")
+
+
+def keyword_bits(lower: str) -> int:
+    """Return the category bits whose keywords appear in the lowercased text."""
+    bits = 0
+    for category, keywords in REQUEST_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in lower:
+                bits |= CATEGORY_BITS[category]
+                break
+    return bits
+
+
+def is_follow_up(lower: str) -> bool:
+    """Check whether a lowercased request refers back to the conversation."""
+    return any(word in FOLLOW_UP_WORDS for word in _WORD_RE.findall(lower))
+
+
+def format_message(role: str, content: str) -> str:
+    """Format one stored message as a line of prompt context."""
+    return ("Human: " if role == "user" else "Assistant: ") + content
+
+
+def format_messages(messages: Iterable[Dict[str, str]]) -> List[str]:
+    """Format stored messages as lines of prompt context."""
+    return [format_message(m['role'], m['content']) for m in messages]
+
+
+def format_context(lines: Iterable[str]) -> str:
+    """Join formatted messages into the prompt's conversation section."""
+    return "\n".join(lines) or NO_CONTEXT
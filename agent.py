@@ -6,121 +6,77 @@ Includes retry logic for rate limit handling.
 
 from google import genai
 from google.genai import types
-from typing import Optional, Tuple
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
+from typing import Iterator, Optional, Tuple
+import asyncio
+import atexit
+import random
 import re
+import threading
 import time
 
-from config import GOOGLE_API_KEY, TEMPERATURE, BOT_NAME
+from config import (
+    GOOGLE_API_KEY, MODEL_NAME, TEMPERATURE, NUMBA_CLASSIFIER,
+    PROMPT_CODEGEN, TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_TTL, WIKI_CACHE_TTL,
+    LLM_REQUESTS_PER_MINUTE, LLM_BURST, LLM_MAX_QUEUE_WAIT
+)
 from tools import (
     search_wikipedia, search_web, search_youtube_videos,
     calculate, SUBJECT_AREAS
 )
 from memory import ConversationMemory
+from _hot import (
+    REQUEST_KEYWORDS, CATEGORY_BITS, QUIZ, FLASH, VIDEO, CALC, SEARCH,
+    keyword_bits, is_follow_up, format_message, format_messages, format_context
+)
+from cache import (
+    SemanticCache, TTLCache, context_hash, load_tool_caches, save_tool_caches,
+    warmup_embedding_model
+)
+
+# Optional dependencies - fall back to plain substring checks without them
+ahocorasick = None
+try:
+    import ahocorasick
+except ImportError:
+    pass
+
+hyperscan = None
+try:
+    import hyperscan
+except ImportError:
+    pass
+
+np = None
+njit = None
+if NUMBA_CLASSIFIER:
+    try:
+        import numpy as np
+        from numba import njit
+        from numba.typed import List as NumbaList
+    except ImportError:
+        njit = None
 
 # Create the client
 client = genai.Client(api_key=GOOGLE_API_KEY)
 
 # Retry configuration
-MAX_RETRIES = 2
-RETRY_DELAY = 5  # seconds
+MAX_RETRIES = 4
+RETRY_DELAY = 5  # seconds, base for exponential backoff
+MAX_RETRY_DELAY = 30  # seconds, cap for a single backoff sleep
+CONTEXT_MESSAGES = 6  # Recent messages included in each prompt
+RATE_LIMIT_MESSAGE = f"⏳ Rate limit reached. Please wait {RETRY_DELAY} seconds and try again."
+EMPTY_RESPONSE_MESSAGE = "I'm sorry, I encountered an error: the model returned an empty response."
 
+CALC_PATTERN = r'\d+\s*[+\-*/^]\s*\d+'
+CALC_RE = re.compile(CALC_PATTERN)
+EXPR_RE = re.compile(r'[\d.\+\-\*\/\^\(\)\s]+')
 
-class SimpleKnowledgeBot:
-    """
-    Educational Knowledge Bot using the new google-genai SDK.
-    Features memory, multiple knowledge tools, subject modes, and ELI5.
-    """
-    
-    def __init__(self, session_id: str, subject: str = "general", eli5_mode: bool = False):
-        self.session_id = session_id
-        self.subject = subject
-        self.eli5_mode = eli5_mode
-        self.memory = ConversationMemory(session_id)
-        self.model_name = "models/gemini-2.5-flash"
-    
-    def set_subject(self, subject: str):
-        """Change the subject focus."""
-        if subject in SUBJECT_AREAS:
-            self.subject = subject
-    
-    def set_eli5_mode(self, enabled: bool):
-        """Toggle ELI5 mode."""
-        self.eli5_mode = enabled
-    
-    def _get_subject_context(self) -> str:
-        """Get subject-specific context."""
-        subject_info = SUBJECT_AREAS.get(self.subject, SUBJECT_AREAS["general"])
-        return f"Subject focus: {subject_info['name']} {subject_info['icon']}"
-    
-    def _is_quiz_request(self, text: str) -> bool:
-        """Check if user is asking for a quiz."""
-        quiz_keywords = ['quiz', 'test me', 'practice questions', 'questions about', 'test my knowledge']
-        return any(kw in text.lower() for kw in quiz_keywords)
-    
-    def _is_flashcard_request(self, text: str) -> bool:
-        """Check if user is asking for flashcards."""
-        flashcard_keywords = ['flashcard', 'flash card', 'study cards', 'vocabulary cards', 'create cards']
-        return any(kw in text.lower() for kw in flashcard_keywords)
-    
-    def _is_video_request(self, text: str) -> bool:
-        """Check if user is asking for videos."""
-        video_keywords = ['video', 'youtube', 'watch', 'tutorial video', 'show me a video']
-        return any(kw in text.lower() for kw in video_keywords)
-    
-    def _is_calculation_request(self, text: str) -> bool:
-        """Check if user is asking for a calculation."""
-        calc_keywords = ['calculate', 'compute', 'what is', 'solve', 'equals']
-        has_numbers = bool(re.search(r'\d+\s*[\+\-\*\/\^]\s*\d+', text))
-        return has_numbers or any(kw in text.lower() for kw in calc_keywords)
-    
-    def chat(self, user_input: str) -> Tuple[str, bool, Optional[str]]:
-        """Process user input with enhanced educational features."""
-        try:
-            tool_results = ""
-            used_tools = False
-            
-            # Handle different types of requests
-            if self._is_calculation_request(user_input):
-                match = re.search(r'[\d\.\+\-\*\/\^\(\)\s]+', user_input)
-                if match:
-                    calc_result = calculate(match.group().strip())
-                    if "Error" not in calc_result:
-                        tool_results = f"\n\n{calc_result}"
-                        used_tools = True
-            
-            if self._is_video_request(user_input):
-                video_result = search_youtube_videos(user_input)
-                if "Error" not in video_result and "No educational videos" not in video_result:
-                    tool_results += f"\n\n{video_result}"
-                    used_tools = True
-            
-            # Check if we need to search for info
-            search_keywords = ['who is', 'what is', 'where is', 'when did', 'how did', 'tell me about', 'explain']
-            needs_search = any(kw in user_input.lower() for kw in search_keywords)
-            
-            if needs_search and not self._is_quiz_request(user_input) and not self._is_flashcard_request(user_input):
-                wiki_result = search_wikipedia(user_input)
-                if "No Wikipedia articles found" not in wiki_result and "Error" not in wiki_result:
-                    tool_results += f"\n\nRelevant information:\n{wiki_result}"
-                    used_tools = True
-                else:
-                    web_result = search_web(user_input)
-                    if "No web results found" not in web_result and "Error" not in web_result:
-                        tool_results += f"\n\nRelevant information:\n{web_result}"
-                        used_tools = True
-            
-            # Get conversation context
-            history = self.memory.get_messages()
-            context = "\n".join([f"{'Human' if m['role']=='user' else 'Assistant'}: {m['content']}" 
-                                for m in history[-6:]])
-            
-            # Build the prompt
-            subject_info = SUBJECT_AREAS.get(self.subject, SUBJECT_AREAS["general"])
-            subject_context = f"Subject focus: {subject_info['name']} {subject_info['icon']}"
-            
-            eli5_instruction = ""
-            if self.eli5_mode:
-                eli5_instruction = """
+# Prompt pieces, compiled once. The static prefix is shared by every request kind;
+# the per-kind templates end with the parts of the prompt that change every turn.
+ELI5_INSTRUCTION = """
 🧒 ELI5 MODE ACTIVE: Explain EVERYTHING as if talking to a 5-year-old child.
 - Use only simple, everyday words
 - Use fun comparisons like "it's like when you..."
@@ -128,18 +84,13 @@ class SimpleKnowledgeBot:
 - Use lots of friendly emojis
 - Make it fun and exciting!
 """
-            
-            # Special handling for quiz requests
-            if self._is_quiz_request(user_input):
-                prompt = f"""You are Nova, an educational AI. Create an engaging quiz!
-{subject_context}
-{eli5_instruction}
 
-Previous conversation:
-{context if context else 'This is the start of our conversation.'}
-
-User request: {user_input}
+STATIC_PREFIX_TEMPLATE = Template("""You are Nova, a friendly and knowledgeable educational AI assistant.
+$subject_context
+$eli5_instruction
+""")
 
+QUIZ_TEMPLATE = Template("""Create an engaging quiz!
 Create a fun quiz with 3-5 multiple choice questions. Format each question like this:
 
 🎯 **Quiz Time!**
@@ -156,18 +107,14 @@ D) [Option D]
 📝 **Answers:**
 1. [Correct answer with brief explanation]
 2. [Correct answer with brief explanation]
-..."""
-            
-            elif self._is_flashcard_request(user_input):
-                prompt = f"""You are Nova, an educational AI. Create helpful study flashcards!
-{subject_context}
-{eli5_instruction}
+...
 
 Previous conversation:
-{context if context else 'This is the start of our conversation.'}
+$context
 
-User request: {user_input}
+User request: $user_input""")
 
+FLASHCARD_TEMPLATE = Template("""Create helpful study flashcards!
 Create 5 flashcards for studying. Format like this:
 
 📚 **Study Flashcards**
@@ -184,65 +131,686 @@ Create 5 flashcards for studying. Format like this:
 
 (Continue with more cards)
 
-💪 **Study tip:** [A helpful tip for remembering this topic]"""
-            
-            else:
-                prompt = f"""You are Nova, a friendly and knowledgeable educational AI assistant.
-{subject_context}
-{eli5_instruction}
+💪 **Study tip:** [A helpful tip for remembering this topic]
+
+Previous conversation:
+$context
+
+User request: $user_input""")
+
+GENERAL_TEMPLATE = Template("""Respond helpfully and naturally. Be warm and use emojis appropriately.
+If there's relevant information provided below, use it to give an accurate answer.
+If the user asks a follow-up question, refer to the person or topic from the previous conversation.
 
 Previous conversation:
-{context if context else 'This is the start of our conversation.'}
+$context
+
+$tool_results
+
+User: $user_input""")
+
+PROMPT_TEMPLATES = {"quiz": QUIZ_TEMPLATE, "flash": FLASHCARD_TEMPLATE, "general": GENERAL_TEMPLATE}
+
+
+def _compile_template(kind: str, template: Template):
+    """
+    Generate a prompt builder that inlines the template's constant text.
+
+    The returned function is a single string concatenation of literals and
+    the `context`, `tool_results` and `user_input` arguments.
+    """
+    pieces = []
+    position = 0
+    text = template.template
+    for match in template.pattern.finditer(text):
+        literal = text[position:match.start()]
+        if match.group("escaped") is not None:
+            literal += template.delimiter
+        if literal:
+            pieces.append(repr(literal))
+        name = match.group("named") or match.group("braced")
+        if name:
+            pieces.append(name)
+        position = match.end()
+    if text[position:]:
+        pieces.append(repr(text[position:]))
+    
+    source = "def build(context, tool_results, user_input):\n    return " + (" + ".join(pieces) or "''") + "\n"
+    namespace = {}
+    exec(compile(source, f"<{kind} prompt>", "exec"), namespace)
+    return namespace["build"]
+
+
+def _substitute_builder(template: Template):
+    """Prompt builder that fills the template with Template.substitute."""
+    def build(context, tool_results, user_input):
+        return template.substitute(context=context, tool_results=tool_results, user_input=user_input)
+    return build
+
+
+if PROMPT_CODEGEN:
+    PROMPT_BUILDERS = {kind: _compile_template(kind, template) for kind, template in PROMPT_TEMPLATES.items()}
+else:
+    PROMPT_BUILDERS = {kind: _substitute_builder(template) for kind, template in PROMPT_TEMPLATES.items()}
+
+Flags = namedtuple("Flags", ["quiz", "flash", "video", "calc", "search"])
+
+# Everything chat() and chat_stream() need once the prompt is ready
+PreparedTurn = namedtuple("PreparedTurn", ["prompt", "used_tools", "query_embedding", "cache_key", "cached_response"])
+
+
+def _build_keyword_automaton():
+    """Build one Aho-Corasick automaton tagging each keyword with its category bits."""
+    if ahocorasick is None:
+        return None
+    
+    masks = {}
+    for category, keywords in REQUEST_KEYWORDS.items():
+        for keyword in keywords:
+            masks[keyword] = masks.get(keyword, 0) | CATEGORY_BITS[category]
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, mask in masks.items():
+        automaton.add_word(keyword, mask)
+    automaton.make_automaton()
+    return automaton
+
+
+KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _scan_keywords(buf, keywords, masks):
+    """
+    Return the OR of `masks[k]` for every keyword `k` found in `buf`.
+    
+    `buf` holds the UTF-8 bytes of the request; ASCII letters are lowercased on a
+    copy. Keywords are ASCII, so multi-byte characters can never match them.
+    """
+    lower = buf.copy()
+    for i in range(lower.shape[0]):
+        if 65 <= lower[i] <= 90:
+            lower[i] += 32
+    
+    result = np.uint32(0)
+    n = lower.shape[0]
+    for k in range(len(keywords)):
+        if result & masks[k] == masks[k]:
+            continue  # Every category of this keyword is already matched
+        keyword = keywords[k]
+        m = keyword.shape[0]
+        for i in range(n - m + 1):
+            if lower[i] != keyword[0]:
+                continue
+            j = 1
+            while j < m and lower[i + j] == keyword[j]:
+                j += 1
+            if j == m:
+                result |= masks[k]
+                break
+    return result
+
+
+def _build_numba_classifier():
+    """
+    JIT-compile the keyword scanner and encode the keywords as byte arrays.
+    
+    Opt-in via NUMBA_CLASSIFIER: for chat-sized inputs the per-call dispatch
+    overhead outweighs the compiled scan, so the automaton is the default.
+    """
+    if njit is None:
+        return None, None, None
+    
+    masks = {}
+    for category, keywords in REQUEST_KEYWORDS.items():
+        for keyword in keywords:
+            masks[keyword] = masks.get(keyword, 0) | CATEGORY_BITS[category]
+    
+    keyword_arrays = NumbaList()
+    for keyword in masks:
+        keyword_arrays.append(np.frombuffer(keyword.encode("ascii"), dtype=np.uint8))
+    keyword_masks = np.array(list(masks.values()), dtype=np.uint32)
+    
+    scanner = njit(cache=True)(_scan_keywords)
+    scanner(np.frombuffer(b"warm up", dtype=np.uint8), keyword_arrays, keyword_masks)  # Compile now
+    return scanner, keyword_arrays, keyword_masks
+
+
+try:
+    _numba_scan, _KEYWORD_ARRAYS, _KEYWORD_MASKS = _build_numba_classifier()
+except Exception:
+    # numba is installed but could not compile the scanner - use the other backends
+    _numba_scan, _KEYWORD_ARRAYS, _KEYWORD_MASKS = None, None, None
+
+
+def _build_calc_database():
+    """Compile the arithmetic-expression pattern into a Hyperscan database."""
+    if hyperscan is None:
+        return None
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[CALC_PATTERN.encode("ascii")],
+            ids=[0],
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH],
+        )
+    except Exception:
+        return None
+    return db
+
+
+CALC_DATABASE = _build_calc_database()
+
+
+def _on_calc_match(match_id, start, end, flags, found):
+    found[0] = True
+
 
-{tool_results}
+def _has_arithmetic(text: str) -> bool:
+    """Check whether the text contains an arithmetic expression like `2 + 3`."""
+    if CALC_DATABASE is None:
+        return bool(CALC_RE.search(text))
+    found = [False]
+    CALC_DATABASE.scan(text.encode("ascii", "ignore"), match_event_handler=_on_calc_match, context=found)
+    return found[0]
 
-User: {user_input}
 
-Respond helpfully and naturally. Be warm and use emojis appropriately.
-If there's relevant information provided above, use it to give an accurate answer.
-If the user asks a follow-up question, refer to the person or topic from the previous conversation."""
+# Tool result caches, keyed by normalized input. Calculations are deterministic and never expire.
+_WIKI_CACHE = TTLCache("wikipedia", TOOL_CACHE_MAX_ENTRIES, WIKI_CACHE_TTL)
+_WEB_CACHE = TTLCache("web", TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_TTL)
+_YT_CACHE = TTLCache("youtube", TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_TTL)
+_CALC_CACHE = TTLCache("calculator", TOOL_CACHE_MAX_ENTRIES)
+_TOOL_CACHES = [_WIKI_CACHE, _WEB_CACHE, _YT_CACHE, _CALC_CACHE]
 
+load_tool_caches(_TOOL_CACHES)
+atexit.register(save_tool_caches, _TOOL_CACHES)
+
+
+# Wikipedia answers that found nothing; kept out of its week-long cache so a miss is retried
+WIKI_MISS_PREFIXES = ("No Wikipedia articles found", "Could not find detailed information")
+
+
+def _cached_tool_call(cache: TTLCache, key: str, tool, *args) -> str:
+    """Call a tool through its cache. Errors are never cached for network tools, nor Wikipedia misses."""
+    result = cache.get(key)
+    if result is None:
+        result = tool(*args)
+        if cache is _CALC_CACHE:
+            cache.set(key, result)
+        elif "Error" not in result and not (cache is _WIKI_CACHE and result.startswith(WIKI_MISS_PREFIXES)):
+            cache.set(key, result)
+    return result
+
+
+def _response_text(response) -> Optional[str]:
+    """
+    Read the text of a response or stream chunk.
+    
+    The common case is one candidate with a single text part, which is read
+    directly; anything else goes through the SDK's `text` property, which
+    joins multiple parts and skips thought parts.
+    """
+    try:
+        parts = response.candidates[0].content.parts
+    except (AttributeError, IndexError, TypeError):
+        parts = None
+    if parts and len(parts) == 1 and not parts[0].thought:
+        return parts[0].text
+    return response.text
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an API error is a 429 / quota error worth retrying."""
+    error_str = str(error).lower()
+    return "429" in error_str or "resource_exhausted" in error_str or "quota" in error_str
+
+
+# Matches the retry hint in quota errors, e.g. "'retryDelay': '12s'" or "retry in 12.5s"
+RETRY_HINT_RE = re.compile(r"retry(?:[_ ]?delay['\"]?\s*[:=]\s*['\"]?| in )(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extract the server's suggested retry delay from an API error, if any."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+    
+    details = getattr(error, "details", None)
+    match = RETRY_HINT_RE.search(str(details) if details else str(error))
+    return float(match.group(1)) if match else None
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff that never undercuts the server's hint."""
+    delay = random.uniform(0, min(MAX_RETRY_DELAY, RETRY_DELAY * (2 ** attempt)))
+    suggested = _retry_after_seconds(error)
+    if suggested is not None:
+        delay = max(delay, suggested)
+    return min(delay, MAX_RETRY_DELAY)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` calls per second in bursts of `capacity`.
+    
+    Each call reserves a token and is told how long to wait for it, so callers
+    are paced in arrival order. A caller that would wait longer than `max_wait`
+    goes ahead without a token and is left to the retry path.
+    """
+    
+    def __init__(self, rate: float, capacity: int, max_wait: float):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.max_wait = max_wait
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take a token and return the seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > self.max_wait:
+                return 0.0
+            self._tokens -= 1
+            return wait
+    
+    def acquire(self):
+        """Block until a token is available."""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        """Wait on the event loop until a token is available."""
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+# Paces Gemini calls below the quota so most requests never see a 429
+_LLM_BUCKET = TokenBucket(LLM_REQUESTS_PER_MINUTE / 60, LLM_BURST, LLM_MAX_QUEUE_WAIT)
+
+
+# Background writer so saving a turn to disk stays off the response path
+_MEMORY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nova-memory")
+
+
+# Background event loop shared by all bots, so the async client stays bound to one loop
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+
+def _run_coroutine(coro):
+    """Run a coroutine on the shared background event loop and wait for its result."""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name="nova-agent-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop).result()
+
+
+def warmup():
+    """
+    Pay one-time startup costs before the first user request.
+    
+    Loads the embedding model and opens the sync and async API connections with
+    a cheap model-metadata call, which does not consume generation quota.
+    """
+    try:
+        warmup_embedding_model()
+    except Exception:
+        pass
+    
+    if not GOOGLE_API_KEY:
+        return
+    
+    try:
+        client.models.get(model=f"models/{MODEL_NAME}")
+        _run_coroutine(client.aio.models.get(model=f"models/{MODEL_NAME}"))
+    except Exception:
+        pass
+
+
+class SimpleKnowledgeBot:
+    """
+    Educational Knowledge Bot using the new google-genai SDK.
+    Features memory, multiple knowledge tools, subject modes, and ELI5.
+    """
+    
+    def __init__(self, session_id: str, subject: str = "general", eli5_mode: bool = False,
+                 persist: bool = True):
+        self.session_id = session_id
+        self.subject = subject
+        self.eli5_mode = eli5_mode
+        self.memory = ConversationMemory(session_id, persist=persist)
+        self.semantic_cache = SemanticCache(session_id)
+        self.model_name = "models/gemini-2.5-flash"
+        self.last_used_tools = False
+        self.last_attempts = 0  # API attempts made by the most recent turn
+        self._pending_write = None  # Future for the previous turn's disk write
+        
+        # Pre-formatted recent messages, so prompts don't rebuild history every turn
+        self._recent = deque(
+            format_messages(self.memory.get_messages()[-CONTEXT_MESSAGES:]),
+            maxlen=CONTEXT_MESSAGES
+        )
+        self._update_subject_info()
+        self._update_eli5_instruction()
+        self._refresh_static_prefix()
+    
+    def set_subject(self, subject: str):
+        """Change the subject focus."""
+        if subject in SUBJECT_AREAS:
+            self.subject = subject
+            self._update_subject_info()
+            self._refresh_static_prefix()
+    
+    def set_eli5_mode(self, enabled: bool):
+        """Toggle ELI5 mode."""
+        self.eli5_mode = enabled
+        self._update_eli5_instruction()
+        self._refresh_static_prefix()
+    
+    def _update_subject_info(self):
+        """Cache everything derived from the current subject."""
+        info = SUBJECT_AREAS.get(self.subject, SUBJECT_AREAS["general"])
+        self._subject_info = info
+        self._subject_context = f"Subject focus: {info['name']} {info['icon']}"
+    
+    def _update_eli5_instruction(self):
+        """Cache the ELI5 instruction block for the current mode."""
+        self._eli5_instruction = ELI5_INSTRUCTION if self.eli5_mode else ""
+    
+    def _refresh_static_prefix(self):
+        """Rebuild the prompt prefix shared by every turn for the current settings."""
+        self._static_prefix = STATIC_PREFIX_TEMPLATE.substitute(
+            subject_context=self._subject_context,
+            eli5_instruction=self._eli5_instruction,
+        )
+    
+    def _get_subject_context(self) -> str:
+        """Get subject-specific context."""
+        return self._subject_context
+    
+    def _classify(self, text: str, lower: str) -> Flags:
+        """Classify a request (and its lowercased copy) into every category with a single scan."""
+        if _numba_scan is not None:
+            buf = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+            bits = int(_numba_scan(buf, _KEYWORD_ARRAYS, _KEYWORD_MASKS))
+        elif KEYWORD_AUTOMATON is not None:
+            bits = 0
+            for _, mask in KEYWORD_AUTOMATON.iter(lower):
+                bits |= mask
+        else:
+            bits = keyword_bits(lower)
+        
+        return Flags(
+            quiz=bool(bits & QUIZ),
+            flash=bool(bits & FLASH),
+            video=bool(bits & VIDEO),
+            calc=bool(bits & CALC) or _has_arithmetic(text),
+            search=bool(bits & SEARCH),
+        )
+    
+    async def _calculate_async(self, expression: str) -> Optional[str]:
+        """Run the calculator tool off the event loop."""
+        calc_result = await asyncio.to_thread(_cached_tool_call, _CALC_CACHE, expression, calculate, expression)
+        if "Error" not in calc_result:
+            return f"\n\n{calc_result}"
+        return None
+    
+    async def _video_search_async(self, user_input: str, key: str) -> Optional[str]:
+        """Run the YouTube search tool off the event loop."""
+        video_result = await asyncio.to_thread(_cached_tool_call, _YT_CACHE, key, search_youtube_videos, user_input)
+        if "Error" not in video_result and "No educational videos" not in video_result:
+            return f"\n\n{video_result}"
+        return None
+    
+    async def _info_search_async(self, user_input: str, key: str) -> Optional[str]:
+        """Search Wikipedia, falling back to the web when it has nothing."""
+        wiki_result = await asyncio.to_thread(_cached_tool_call, _WIKI_CACHE, key, search_wikipedia, user_input)
+        if "No Wikipedia articles found" not in wiki_result and "Error" not in wiki_result:
+            return f"\n\nRelevant information:\n{wiki_result}"
+        
+        web_result = await asyncio.to_thread(_cached_tool_call, _WEB_CACHE, key, search_web, user_input)
+        if "No web results found" not in web_result and "Error" not in web_result:
+            return f"\n\nRelevant information:\n{web_result}"
+        return None
+    
+    async def _run_tools(self, user_input: str, flags: Flags, key: str) -> Tuple[str, bool]:
+        """
+        Run every tool the request needs concurrently and merge their output.
+        
+        `key` is the normalized input the tool caches are keyed by.
+        """
+        tasks = []
+        
+        # Handle different types of requests
+        if flags.calc:
+            match = EXPR_RE.search(user_input)
+            if match:
+                tasks.append(self._calculate_async(match.group().strip()))
+        
+        if flags.video:
+            tasks.append(self._video_search_async(user_input, key))
+        
+        # Check if we need to search for info
+        if flags.search and not flags.quiz and not flags.flash:
+            tasks.append(self._info_search_async(user_input, key))
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        snippets = [r for r in results if isinstance(r, str)]
+        return "".join(snippets), bool(snippets)
+    
+    def chat(self, user_input: str) -> Tuple[str, bool, Optional[str]]:
+        """Process user input with enhanced educational features."""
+        return _run_coroutine(self.chat_async(user_input))
+    
+    async def _prepare_turn(self, user_input: str) -> PreparedTurn:
+        """Run tools, build the prompt and check the semantic cache for one turn."""
+        # The previous turn must be persisted before memory and the cache are read again
+        if self._pending_write is not None and not self._pending_write.done():
+            await asyncio.to_thread(self._wait_for_pending_write)
+        self._wait_for_pending_write()
+        
+        # Lowercase once: the classifier and the tool cache keys both use it
+        lower = user_input.lower()
+        flags = self._classify(user_input, lower)
+        
+        # Quizzes and flashcards should come out fresh each time, and follow-ups
+        # depend on the conversation, so only standalone questions use the semantic cache
+        kind = "quiz" if flags.quiz else "flash" if flags.flash else "general"
+        cacheable = kind == "general" and not (self._recent and is_follow_up(lower))
+        
+        # Embed the query for the semantic cache while the tools are running
+        if cacheable:
+            (tool_results, used_tools), query_embedding = await asyncio.gather(
+                self._run_tools(user_input, flags, lower.strip()),
+                asyncio.to_thread(self.semantic_cache.embed, user_input),
+            )
+        else:
+            tool_results, used_tools = await self._run_tools(user_input, flags, lower.strip())
+            query_embedding = None
+        
+        # Get conversation context
+        context = format_context(self._recent)
+        
+        # Build the prompt: the static prefix comes first so Gemini's implicit
+        # prompt cache can match it, everything that changes per turn goes last
+        dynamic_tail = PROMPT_BUILDERS[kind](context, tool_results, user_input)
+        
+        prompt = types.Content(role="user", parts=[
+            types.Part(text=self._static_prefix),
+            types.Part(text=dynamic_tail),
+        ])
+        
+        # Reuse the answer to a near-identical question asked with the same settings and tool results
+        cache_key = context_hash(self.subject, self.eli5_mode, tool_results)
+        cached_response = self.semantic_cache.lookup(query_embedding, cache_key)
+        
+        return PreparedTurn(prompt, used_tools, query_embedding, cache_key, cached_response)
+    
+    def _remember(self, user_input: str, response_text: str, turn: PreparedTurn):
+        """Save a finished turn to memory and the semantic cache in the background."""
+        self._recent.append(format_message("user", user_input))
+        self._recent.append(format_message("assistant", response_text))
+        self._pending_write = _MEMORY_EXECUTOR.submit(self._persist_turn, user_input, response_text, turn)
+    
+    def _persist_turn(self, user_input: str, response_text: str, turn: PreparedTurn):
+        """Write a finished turn to memory (and disk) and the semantic cache."""
+        self.memory.add_interaction(user_input, response_text)
+        if turn.cached_response is None:
+            self.semantic_cache.add(turn.query_embedding, turn.cache_key, response_text)
+    
+    def _wait_for_pending_write(self):
+        """Block until the previous turn's background write has finished."""
+        if self._pending_write is not None:
+            try:
+                self._pending_write.result()
+            except Exception:
+                pass  # A failed save shouldn't break the next turn
+            self._pending_write = None
+    
+    async def chat_async(self, user_input: str) -> Tuple[str, bool, Optional[str]]:
+        """Async version of chat() that runs independent tool calls concurrently."""
+        try:
+            turn = await self._prepare_turn(user_input)
+            if turn.cached_response is not None:
+                self._remember(user_input, turn.cached_response, turn)
+                return turn.cached_response, turn.used_tools, None
+            
             # Generate response using the new SDK with retry logic
             response_text = None
             last_error = None
+            rate_limited = True
             
             for attempt in range(MAX_RETRIES):
+                self.last_attempts = attempt + 1
                 try:
-                    response = client.models.generate_content(
+                    await _LLM_BUCKET.acquire_async()
+                    response = await client.aio.models.generate_content(
                         model=self.model_name,
-                        contents=prompt,
+                        contents=turn.prompt,
                         config=types.GenerateContentConfig(
                             temperature=TEMPERATURE,
                         )
                     )
-                    response_text = response.text
+                    response_text = _response_text(response)
+                    rate_limited = False
                     break  # Success, exit retry loop
                 except Exception as api_error:
                     last_error = api_error
-                    error_str = str(api_error).lower()
-                    if "429" in error_str or "resource_exhausted" in error_str or "quota" in error_str:
+                    if _is_rate_limit_error(api_error):
                         if attempt < MAX_RETRIES - 1:
-                            time.sleep(RETRY_DELAY * (attempt + 1))  # Exponential backoff
+                            await asyncio.sleep(_backoff_delay(attempt, api_error))
                             continue
                     else:
                         raise api_error
             
-            if response_text is None:
-                return f"⏳ Rate limit reached. Please wait {RETRY_DELAY} seconds and try again.", False, None
+            if rate_limited:
+                return RATE_LIMIT_MESSAGE, False, None
+            if not response_text:
+                # Nothing to answer with (e.g. a blocked response) - don't save the turn
+                return EMPTY_RESPONSE_MESSAGE, False, None
             
             # Save to memory
-            self.memory.add_interaction(user_input, response_text)
+            self._remember(user_input, response_text, turn)
             
-            return response_text, used_tools, None
+            return response_text, turn.used_tools, None
             
         except Exception as e:
             return f"I'm sorry, I encountered an error: {str(e)}", False, None
     
+    def chat_stream(self, user_input: str) -> Iterator[str]:
+        """
+        Stream the response as it is generated.
+        
+        Yields text chunks; the full response is saved to memory once the stream
+        ends. Whether tools were used is available as `last_used_tools` afterwards.
+        """
+        self.last_used_tools = False
+        try:
+            turn = _run_coroutine(self._prepare_turn(user_input))
+        except Exception as e:
+            yield f"I'm sorry, I encountered an error: {str(e)}"
+            return
+        
+        self.last_used_tools = turn.used_tools
+        if turn.cached_response is not None:
+            self._remember(user_input, turn.cached_response, turn)
+            yield turn.cached_response
+            return
+        
+        # Retry only until the first chunk arrives; a new attempt restarts the request
+        stream = None
+        first_chunk = None
+        for attempt in range(MAX_RETRIES):
+            self.last_attempts = attempt + 1
+            try:
+                _LLM_BUCKET.acquire()
+                stream = client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=turn.prompt,
+                    config=types.GenerateContentConfig(
+                        temperature=TEMPERATURE,
+                    )
+                )
+                first_chunk = next(stream, None)
+                break
+            except Exception as api_error:
+                stream = None
+                if not _is_rate_limit_error(api_error):
+                    self.last_used_tools = False
+                    yield f"I'm sorry, I encountered an error: {str(api_error)}"
+                    return
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(_backoff_delay(attempt, api_error))
+        
+        if stream is None:
+            self.last_used_tools = False
+            yield RATE_LIMIT_MESSAGE
+            return
+        
+        parts = []
+        try:
+            chunk = first_chunk
+            while chunk is not None:
+                text = _response_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+                chunk = next(stream, None)
+        except Exception as e:
+            # Text has already been shown, so don't replay it - just report the failure
+            yield f"\n\n⚠️ The response was interrupted: {str(e)}"
+            return
+        
+        if not parts:
+            # The stream ended without any text - report it instead of saving an empty turn
+            self.last_used_tools = False
+            yield EMPTY_RESPONSE_MESSAGE
+            return
+        
+        self._remember(user_input, "".join(parts), turn)
+    
     def get_conversation_history(self) -> list:
+        self._wait_for_pending_write()
         return self.memory.get_messages()
     
     def clear_memory(self):
+        self._wait_for_pending_write()
         self.memory.clear()
+        self._recent.clear()
+        self.semantic_cache.clear()
 
 
 # Alias for compatibility
@@ -5,9 +5,15 @@ subject modes, and ELI5 (Explain Like I'm 5) mode.
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import atexit
+import os
+import re
 import uuid
-import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Page configuration
@@ -18,29 +24,49 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load custom CSS
+# Load custom CSS, re-reading the file only when it changes
+@st.cache_data(show_spinner=False)
+def read_css(path: str, mtime: float) -> str:
+    with open(path) as f:
+        return f"<style>{f.read()}</style>"
+
 def load_css():
     css_file = Path(__file__).parent / "styles.css"
-    if css_file.exists():
-        with open(css_file) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    try:
+        mtime = css_file.stat().st_mtime
+    except FileNotFoundError:
+        return
+    st.markdown(read_css(str(css_file), mtime), unsafe_allow_html=True)
 
 load_css()
 
 # Import after config to avoid issues
-from config import GOOGLE_API_KEY, BOT_NAME, BOT_AVATAR, USER_AVATAR
-from memory import ChatHistoryManager
-from agent import SimpleKnowledgeBot, KnowledgeBot
-from tools import SUBJECT_AREAS
+from config import GOOGLE_API_KEY, BOT_NAME, BOT_AVATAR, USER_AVATAR, WARMUP_ON_START, RENDER_WINDOW
+from memory import ChatHistoryManager, DATE_FORMAT
+from agent import SimpleKnowledgeBot, KnowledgeBot, warmup
+from cache import delete_semantic_cache
+from tools import SUBJECT_AREAS, SUBJECT_OPTIONS, SUBJECT_OPTION_KEYS, SUBJECT_SUGGESTIONS
+
+# Warm up the API client and embedding model once per server process
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    thread = threading.Thread(target=warmup, name="nova-warmup", daemon=True)
+    thread.start()
+    return thread
+
+if WARMUP_ON_START:
+    start_warmup()
+
+def new_session_id() -> str:
+    """Short random id for a conversation; also names its history file and widget keys."""
+    return uuid.uuid4().hex[:16]
 
 # Initialize session state
 def init_session_state():
     if "session_id" not in st.session_state:
-        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.session_id = new_session_id()
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "bot" not in st.session_state:
-        st.session_state.bot = None
     if "is_typing" not in st.session_state:
         st.session_state.is_typing = False
     if "show_welcome" not in st.session_state:
@@ -49,351 +75,467 @@ def init_session_state():
         st.session_state.subject = "general"
     if "eli5_mode" not in st.session_state:
         st.session_state.eli5_mode = False
+    if "history_pages" not in st.session_state:
+        st.session_state.history_pages = 1
+    if "quick_action" not in st.session_state:
+        st.session_state.quick_action = None
+    if "render_window" not in st.session_state:
+        st.session_state.render_window = RENDER_WINDOW
+    if "last_saved_idx" not in st.session_state:
+        st.session_state.last_saved_idx = 0  # Messages already written to the session's log
+    if "pending_actions" not in st.session_state:
+        st.session_state.pending_actions = []  # Sidebar clicks, applied together at the end of the sidebar
+    if "bots" not in st.session_state:
+        st.session_state.bots = OrderedDict()  # session_id -> bot, most recently used last
+    if "sidebar_error" not in st.session_state:
+        st.session_state.sidebar_error = None  # Shown once in the history section
+    if "history_select_gen" not in st.session_state:
+        st.session_state.history_select_gen = 0  # Bumped to reset the history selectbox
 
 init_session_state()
 
 # History manager
 history_manager = ChatHistoryManager()
 
-# Sidebar
-def render_sidebar():
-    with st.sidebar:
-        # Logo and title
-        st.markdown("""
-        <div style="text-align: center; padding: 1rem 0;">
-            <div style="font-size: 3rem; margin-bottom: 0.5rem;">🎓</div>
-            <h1 style="
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                font-size: 1.75rem;
-                margin: 0;
-            ">Nova</h1>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin-top: 0.25rem;">
-                Your Educational Companion
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("---")
-        
-        # Subject Mode Selector
-        st.markdown("""
-        <div class="sidebar-title">📚 Subject Mode</div>
-        """, unsafe_allow_html=True)
-        
-        subject_options = {key: f"{val['icon']} {val['name']}" for key, val in SUBJECT_AREAS.items()}
-        selected_subject = st.selectbox(
-            "Choose subject focus",
-            options=list(subject_options.keys()),
-            format_func=lambda x: subject_options[x],
-            index=list(subject_options.keys()).index(st.session_state.subject),
-            key="subject_selector",
-            label_visibility="collapsed"
-        )
-        
-        if selected_subject != st.session_state.subject:
-            st.session_state.subject = selected_subject
-            if st.session_state.bot:
-                st.session_state.bot.set_subject(selected_subject)
-            st.rerun()
-        
-        # ELI5 Mode Toggle
-        st.markdown("<br>", unsafe_allow_html=True)
-        eli5_col1, eli5_col2 = st.columns([3, 1])
-        with eli5_col1:
-            st.markdown("""
-            <div style="color: #a0a0b0; font-size: 0.9rem;">
-                🧒 <strong>ELI5 Mode</strong><br>
-                <span style="font-size: 0.75rem;">Simplified explanations</span>
-            </div>
-            """, unsafe_allow_html=True)
-        with eli5_col2:
-            eli5_toggle = st.toggle("", value=st.session_state.eli5_mode, key="eli5_toggle", label_visibility="collapsed")
-            if eli5_toggle != st.session_state.eli5_mode:
-                st.session_state.eli5_mode = eli5_toggle
-                if st.session_state.bot:
-                    st.session_state.bot.set_eli5_mode(eli5_toggle)
-                st.rerun()
-        
-        st.markdown("---")
-        
-        # Quick Actions
-        st.markdown("""
-        <div class="sidebar-title">⚡ Quick Actions</div>
-        """, unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("🎯 Quiz", use_container_width=True, key="quick_quiz"):
-                return "generate_quiz"
-            if st.button("🧮 Math", use_container_width=True, key="quick_math"):
-                return "calculate"
-        with col2:
-            if st.button("📝 Cards", use_container_width=True, key="quick_cards"):
-                return "generate_flashcards"
-            if st.button("🎬 Videos", use_container_width=True, key="quick_videos"):
-                return "find_videos"
-        
-        st.markdown("---")
-        
-        # New chat button
-        if st.button("✨ New Chat", use_container_width=True, key="new_chat"):
-            st.session_state.session_id = str(uuid.uuid4())
-            st.session_state.messages = []
-            st.session_state.bot = None
-            st.session_state.show_welcome = True
-            st.rerun()
-        
-        st.markdown("---")
-        
-        # Chat history
-        st.markdown("""
-        <div class="sidebar-title">
-            📜 Chat History
-        </div>
-        """, unsafe_allow_html=True)
-        
-        conversations = history_manager.get_all_conversations()
-        
-        if conversations:
-            for conv in conversations[:10]:  # Show last 10 conversations
-                is_active = conv["session_id"] == st.session_state.session_id
-                
-                # Format date
-                try:
-                    updated = datetime.fromisoformat(conv["updated_at"])
-                    date_str = updated.strftime("%b %d, %I:%M %p")
-                except:
-                    date_str = "Unknown"
-                
-                col1, col2 = st.columns([5, 1])
-                
-                with col1:
-                    if st.button(
-                        f"{'🔵 ' if is_active else '💬 '}{conv['title'][:30]}...",
-                        key=f"hist_{conv['session_id']}",
-                        use_container_width=True
-                    ):
-                        # Load this conversation
-                        st.session_state.session_id = conv["session_id"]
-                        loaded = history_manager.load_conversation(conv["session_id"])
-                        if loaded:
-                            st.session_state.messages = loaded.get("messages", [])
-                            st.session_state.bot = None
-                            st.session_state.show_welcome = False
-                        st.rerun()
-                
-                with col2:
-                    if st.button("🗑️", key=f"del_{conv['session_id']}", help="Delete"):
-                        history_manager.delete_conversation(conv["session_id"])
-                        if conv["session_id"] == st.session_state.session_id:
-                            st.session_state.session_id = str(uuid.uuid4())
-                            st.session_state.messages = []
-                            st.session_state.bot = None
-                        st.rerun()
-        else:
-            st.markdown("""
-            <p style="color: #6b6b7b; text-align: center; padding: 1rem;">
-                No conversations yet.<br>Start chatting! 💬
-            </p>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("---")
-        
-        # Bot status
-        api_status = "🟢 Connected" if GOOGLE_API_KEY else "🔴 No API Key"
-        subject_info = SUBJECT_AREAS.get(st.session_state.subject, SUBJECT_AREAS["general"])
-        eli5_status = "🧒 ELI5 On" if st.session_state.eli5_mode else ""
-        
-        st.markdown(f"""
-        <div style="padding: 1rem; background: #252538; border-radius: 0.75rem; margin-top: 1rem;">
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">
-                <strong>Status:</strong> {api_status}
-            </p>
-            <p style="color: #6b6b7b; font-size: 0.75rem; margin: 0.5rem 0 0 0;">
-                {subject_info['icon']} {subject_info['name']} {eli5_status}
-            </p>
-            <p style="color: #6b6b7b; font-size: 0.75rem; margin: 0.5rem 0 0 0;">
-                Powered by Google Gemini
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
+def history_fingerprint():
+    """Cheap version stamp for the history index, which every save and delete rewrites."""
+    try:
+        stat = os.stat(history_manager.index_path)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_mtime_ns, stat.st_size
+
+# Background writer for chat history, shared by every session in this server process
+@st.cache_resource(show_spinner=False)
+def get_save_pool():
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nova-history")
+    atexit.register(pool.shutdown, wait=True)
+    return pool, {}  # pool, session_id -> latest save Future
+
+def schedule_save(session_id: str, new_messages: list):
+    """Append messages to a session's log off the request path; appends run in order."""
+    pool, pending = get_save_pool()
+    future = pool.submit(history_manager.append_messages, session_id, list(new_messages))
+    pending[session_id] = future
+    future.add_done_callback(lambda f: pending.pop(session_id, None) if pending.get(session_id) is f else None)
+
+def save_new_messages():
+    """Queue the messages added since the last save for the current session."""
+    messages = st.session_state.messages
+    if len(messages) <= st.session_state.last_saved_idx:
+        return  # Nothing new since the last save
+    new_messages = messages[st.session_state.last_saved_idx:]
+    st.session_state.last_saved_idx = len(messages)
+    schedule_save(st.session_state.session_id, new_messages)
+
+def wait_for_save(session_id: str):
+    """Block until the latest queued save for a session has been written."""
+    _, pending = get_save_pool()
+    future = pending.get(session_id)
+    if future is not None:
+        try:
+            future.result()
+        except Exception:
+            pass
+
+HISTORY_PAGE_SIZE = 10
+
+# Re-read a page of saved conversations only when the history index changes.
+# Every save changes the fingerprint, so old entries are evicted rather than kept forever.
+@st.cache_data(show_spinner=False, max_entries=16)
+def list_conversation_page(fingerprint, cursor):
+    return history_manager.list_page(cursor, limit=HISTORY_PAGE_SIZE)
+
+def list_conversations():
+    """
+    Conversations on every loaded sidebar page, plus the cursor for the next one.
+    
+    The open conversation may still have a save in flight. Rather than wait for
+    it, it is listed first from session state.
+    """
+    fingerprint = history_fingerprint()
+    conversations, cursor = [], None
+    for _ in range(st.session_state.history_pages):
+        page, cursor = list_conversation_page(fingerprint, cursor)
+        conversations.extend(page)
+        if cursor is None:
+            break
     
-    return None
+    _, pending = get_save_pool()
+    current = st.session_state.session_id
+    future = pending.get(current)
+    if future is not None and not future.done():
+        saved = next((c for c in conversations if c["session_id"] == current), {})
+        in_flight = {
+            "session_id": current,
+            "title": saved.get("title") or ChatHistoryManager._make_title(st.session_state.messages) or "New Conversation",
+            "date_str": datetime.now().strftime(DATE_FORMAT),
+        }
+        conversations = [in_flight] + [c for c in conversations if c["session_id"] != current]
+    return conversations, cursor
 
+def queue_action(kind: str, arg=None):
+    st.session_state.pending_actions.append((kind, arg))
 
-def render_welcome():
-    """Render the welcome screen using native Streamlit components."""
-    subject_info = SUBJECT_AREAS.get(st.session_state.subject, SUBJECT_AREAS["general"])
+def apply_action(kind: str, arg) -> bool:
+    """Apply one queued sidebar action. Returns True if the main pane has to be redrawn."""
+    if kind == "subject":
+        st.session_state.subject = arg
+    elif kind == "eli5":
+        st.session_state.eli5_mode = arg
+    elif kind == "quick":
+        st.session_state.quick_action = arg
+    elif kind == "new_chat":
+        st.session_state.session_id = new_session_id()
+        st.session_state.messages = []
+        st.session_state.last_saved_idx = 0
+        st.session_state.show_welcome = True
+        st.session_state.render_window = RENDER_WINDOW
+        list_conversation_page.clear()
+    elif kind == "load":
+        # Load this conversation; stay on the open one if it is gone (e.g. deleted in another tab)
+        wait_for_save(arg)
+        loaded = history_manager.load_conversation(arg)
+        if not loaded:
+            st.session_state.sidebar_error = "That conversation could not be loaded. It may have been deleted."
+            list_conversation_page.clear()
+            st.session_state.history_select_gen += 1  # Drop the failed selection, or it would be retried
+            return False
+        st.session_state.session_id = arg
+        st.session_state.messages = loaded.get("messages", [])
+        st.session_state.last_saved_idx = len(st.session_state.messages)
+        st.session_state.show_welcome = False
+        st.session_state.render_window = RENDER_WINDOW
+    elif kind == "delete":
+        wait_for_save(arg)
+        bot = st.session_state.bots.pop(arg, None)
+        if bot is not None:
+            bot._wait_for_pending_write()  # Its last turn may still be saving the semantic cache
+        history_manager.delete_conversation(arg)
+        delete_semantic_cache(arg)
+        list_conversation_page.clear()
+        # The sidebar only offers to delete the open conversation
+        st.session_state.session_id = new_session_id()
+        st.session_state.messages = []
+        st.session_state.last_saved_idx = 0
+        st.session_state.render_window = RENDER_WINDOW
+    elif kind == "more":
+        st.session_state.history_pages += 1
+        return False
+    return True
+
+def apply_pending_actions():
+    """Apply every queued action, then rerun once: the whole app if needed, otherwise just the sidebar."""
+    actions = st.session_state.pending_actions
+    if not actions:
+        return
+    full = False
+    for kind, arg in actions:
+        full = apply_action(kind, arg) or full
+    actions.clear()
+    # A fragment-scoped rerun is only allowed while the fragment is rerunning on its own
+    ctx = get_script_run_ctx()
+    if full or not (ctx and ctx.fragment_ids_this_run):
+        st.rerun()
+    st.rerun(scope="fragment")
+
+# Sidebar, rendered as a fragment so sidebar-only interactions rerun just the sidebar.
+# Handlers only queue their action; apply_pending_actions runs them all at the end.
+@st.fragment
+def render_sidebar():
+    # Logo and title
+    st.markdown("""
+    <div style="text-align: center; padding: 1rem 0;">
+        <div style="font-size: 3rem; margin-bottom: 0.5rem;">🎓</div>
+        <h1 style="
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            -webkit-background-clip: text;
+            -webkit-text-fill-color: transparent;
+            font-size: 1.75rem;
+            margin: 0;
+        ">Nova</h1>
+        <p style="color: #a0a0b0; font-size: 0.85rem; margin-top: 0.25rem;">
+            Your Educational Companion
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
     
-    # Welcome header
     st.markdown("---")
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        st.markdown("""
-        <div style="text-align: center; padding: 2rem;">
-            <div style="font-size: 5rem; margin-bottom: 1rem;">🎓</div>
-            <h1 style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-                font-size: 2.5rem; margin: 0;">Hello! I'm Nova</h1>
-            <p style="color: #a0a0b0; font-size: 1.1rem; margin-top: 0.5rem;">
-                Your intelligent educational companion
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
     
-    st.markdown("---")
+    # Subject Mode Selector
+    st.markdown("""
+    <div class="sidebar-title">📚 Subject Mode</div>
+    """, unsafe_allow_html=True)
     
-    # Feature cards using Streamlit columns
-    st.markdown("### ✨ What I Can Do For You")
+    selected_subject = st.selectbox(
+        "Choose subject focus",
+        options=SUBJECT_OPTION_KEYS,
+        format_func=SUBJECT_OPTIONS.__getitem__,
+        index=SUBJECT_OPTION_KEYS.index(st.session_state.subject),
+        key="subject_selector",
+        label_visibility="collapsed"
+    )
     
-    col1, col2, col3 = st.columns(3)
+    if selected_subject != st.session_state.subject:
+        queue_action("subject", selected_subject)
     
-    with col1:
-        st.markdown("""
-        <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
-            <div style="font-size: 2.5rem;">🎯</div>
-            <h4 style="color: white; margin: 0.5rem 0;">Quizzes</h4>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">Test your knowledge with interactive quizzes</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
+    # ELI5 Mode Toggle
+    st.markdown("<br>", unsafe_allow_html=True)
+    eli5_col1, eli5_col2 = st.columns([3, 1])
+    with eli5_col1:
         st.markdown("""
-        <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
-            <div style="font-size: 2.5rem;">🧮</div>
-            <h4 style="color: white; margin: 0.5rem 0;">Calculator</h4>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">Solve math problems instantly</p>
+        <div style="color: #a0a0b0; font-size: 0.9rem;">
+            🧒 <strong>ELI5 Mode</strong><br>
+            <span style="font-size: 0.75rem;">Simplified explanations</span>
         </div>
         """, unsafe_allow_html=True)
+    with eli5_col2:
+        eli5_toggle = st.toggle("", value=st.session_state.eli5_mode, key="eli5_toggle", label_visibility="collapsed")
+        if eli5_toggle != st.session_state.eli5_mode:
+            queue_action("eli5", eli5_toggle)
     
+    st.markdown("---")
+    
+    # Quick Actions
+    st.markdown("""
+    <div class="sidebar-title">⚡ Quick Actions</div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🎯 Quiz", use_container_width=True, key="quick_quiz"):
+            queue_action("quick", "generate_quiz")
+        if st.button("🧮 Math", use_container_width=True, key="quick_math"):
+            queue_action("quick", "calculate")
     with col2:
-        st.markdown("""
-        <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
-            <div style="font-size: 2.5rem;">📝</div>
-            <h4 style="color: white; margin: 0.5rem 0;">Flashcards</h4>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">Create study cards for any topic</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("""
-        <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
-            <div style="font-size: 2.5rem;">🧒</div>
-            <h4 style="color: white; margin: 0.5rem 0;">ELI5 Mode</h4>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">Simple explanations for beginners</p>
-        </div>
-        """, unsafe_allow_html=True)
+        if st.button("📝 Cards", use_container_width=True, key="quick_cards"):
+            queue_action("quick", "generate_flashcards")
+        if st.button("🎬 Videos", use_container_width=True, key="quick_videos"):
+            queue_action("quick", "find_videos")
     
-    with col3:
-        st.markdown("""
-        <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
-            <div style="font-size: 2.5rem;">🎬</div>
-            <h4 style="color: white; margin: 0.5rem 0;">Videos</h4>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">Find educational videos on YouTube</p>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown("---")
+    
+    # New chat button
+    if st.button("✨ New Chat", use_container_width=True, key="new_chat"):
+        queue_action("new_chat")
+    
+    st.markdown("---")
+    
+    # Chat history
+    st.markdown("""
+    <div class="sidebar-title">
+        📜 Chat History
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if st.session_state.sidebar_error:
+        st.error(st.session_state.sidebar_error)
+        st.session_state.sidebar_error = None
+    
+    conversations, next_cursor = list_conversations()
+    
+    if conversations:
+        # One selectbox and one delete button, however many conversations are listed
+        labels = {
+            conv["session_id"]: f"💬 {conv['title'][:30]}... · {conv.get('date_str', 'Unknown')}"
+            for conv in conversations
+        }
+        session_ids = list(labels)
+        current = st.session_state.session_id
+        is_saved = current in labels
+        
+        selected = st.selectbox(
+            "Chat history",
+            options=session_ids,
+            format_func=labels.__getitem__,
+            index=session_ids.index(current) if is_saved else None,
+            placeholder="Open a conversation...",
+            # A fresh widget whenever the open conversation changes or a load fails
+            key=f"hist_select_{current}_{st.session_state.history_select_gen}",
+            label_visibility="collapsed"
+        )
+        if selected is not None and selected != current:
+            queue_action("load", selected)
         
+        if st.button("🗑️ Delete current chat", use_container_width=True, key="delete_current", disabled=not is_saved):
+            queue_action("delete", current)
+        
+        if next_cursor is not None:
+            if st.button("Load more", use_container_width=True, key="history_more"):
+                queue_action("more")
+    else:
         st.markdown("""
-        <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
-            <div style="font-size: 2.5rem;">📚</div>
-            <h4 style="color: white; margin: 0.5rem 0;">Subject Focus</h4>
-            <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">Specialized learning by subject</p>
-        </div>
+        <p style="color: #6b6b7b; text-align: center; padding: 1rem;">
+            No conversations yet.<br>Start chatting! 💬
+        </p>
         """, unsafe_allow_html=True)
     
     st.markdown("---")
     
-    # Suggestion chips based on subject
-    st.markdown("<br>", unsafe_allow_html=True)
-    st.markdown("**Try asking me:**")
-    
-    subject_suggestions = {
-        "general": [
-            "Quiz me on world capitals",
-            "Explain quantum physics",
-            "Create flashcards for photosynthesis",
-            "Find videos about black holes"
-        ],
-        "math": [
-            "Calculate 456 * 789",
-            "Explain the Pythagorean theorem",
-            "Quiz me on fractions",
-            "Create flashcards for algebra"
-        ],
-        "science": [
-            "Explain how DNA works",
-            "Quiz me on the periodic table",
-            "Create flashcards for chemistry",
-            "Find videos about evolution"
-        ],
-        "history": [
-            "Tell me about World War 2",
-            "Quiz me on ancient Rome",
-            "Create flashcards for US presidents",
-            "Find videos about the Renaissance"
-        ],
-        "literature": [
-            "Explain Shakespeare's themes",
-            "Quiz me on literary devices",
-            "Create flashcards for poetry terms",
-            "Who wrote To Kill a Mockingbird?"
-        ],
-        "programming": [
-            "Explain what is an API",
-            "Quiz me on Python basics",
-            "Create flashcards for data structures",
-            "Find videos about machine learning"
-        ],
-        "geography": [
-            "Name the longest river",
-            "Quiz me on countries",
-            "Create flashcards for continents",
-            "Find videos about climate zones"
-        ],
-        "art": [
-            "Who painted the Mona Lisa?",
-            "Quiz me on art movements",
-            "Create flashcards for music theory",
-            "Find videos about impressionism"
-        ]
-    }
+    # Bot status
+    api_status = "🟢 Connected" if GOOGLE_API_KEY else "🔴 No API Key"
+    subject_info = SUBJECT_AREAS.get(st.session_state.subject, SUBJECT_AREAS["general"])
+    eli5_status = "🧒 ELI5 On" if st.session_state.eli5_mode else ""
     
-    suggestions = subject_suggestions.get(st.session_state.subject, subject_suggestions["general"])
+    st.markdown(f"""
+    <div style="padding: 1rem; background: #252538; border-radius: 0.75rem; margin-top: 1rem;">
+        <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">
+            <strong>Status:</strong> {api_status}
+        </p>
+        <p style="color: #6b6b7b; font-size: 0.75rem; margin: 0.5rem 0 0 0;">
+            {subject_info['icon']} {subject_info['name']} {eli5_status}
+        </p>
+        <p style="color: #6b6b7b; font-size: 0.75rem; margin: 0.5rem 0 0 0;">
+            Powered by Google Gemini
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
     
-    cols = st.columns(len(suggestions))
-    for i, suggestion in enumerate(suggestions):
-        with cols[i]:
-            if st.button(suggestion, key=f"sug_{i}", use_container_width=True):
-                return suggestion
+    apply_pending_actions()
+
+
+# Static welcome screen, built once at import and emitted with a single markdown call
+WELCOME_HTML_HEADER = """
+<hr>
+<div style="text-align: center; padding: 2rem; max-width: 50%; margin: 0 auto;">
+    <div style="font-size: 5rem; margin-bottom: 1rem;">🎓</div>
+    <h1 style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        -webkit-background-clip: text; -webkit-text-fill-color: transparent;
+        font-size: 2.5rem; margin: 0;">Hello! I'm Nova</h1>
+    <p style="color: #a0a0b0; font-size: 1.1rem; margin-top: 0.5rem;">
+        Your intelligent educational companion
+    </p>
+</div>
+<hr>
+<h3>✨ What I Can Do For You</h3>
+"""
+
+WELCOME_CARD_HTML = """
+    <div style="background: #252538; border-radius: 1rem; padding: 1.5rem; text-align: center; margin: 0.5rem 0; border: 1px solid rgba(255,255,255,0.1);">
+        <div style="font-size: 2.5rem;">{icon}</div>
+        <h4 style="color: white; margin: 0.5rem 0;">{title}</h4>
+        <p style="color: #a0a0b0; font-size: 0.85rem; margin: 0;">{text}</p>
+    </div>"""
+
+WELCOME_FEATURES = [
+    ("🎯", "Quizzes", "Test your knowledge with interactive quizzes"),
+    ("📝", "Flashcards", "Create study cards for any topic"),
+    ("🎬", "Videos", "Find educational videos on YouTube"),
+    ("🧮", "Calculator", "Solve math problems instantly"),
+    ("🧒", "ELI5 Mode", "Simple explanations for beginners"),
+    ("📚", "Subject Focus", "Specialized learning by subject"),
+]
+
+# Three-column CSS grid instead of st.columns
+WELCOME_CARDS_HTML = (
+    '<div style="display: grid; grid-template-columns: repeat(3, 1fr); column-gap: 1rem;">'
+    + "".join(WELCOME_CARD_HTML.format(icon=icon, title=title, text=text) for icon, title, text in WELCOME_FEATURES)
+    + "\n</div>\n"
+)
+
+WELCOME_FOOTER_HTML = """<hr>
+<br>
+<p><strong>Try asking me:</strong></p>
+"""
+
+
+def render_welcome():
+    """Render the welcome screen: one static HTML block plus the suggestion buttons."""
+    st.markdown(WELCOME_HTML_HEADER + WELCOME_CARDS_HTML + WELCOME_FOOTER_HTML, unsafe_allow_html=True)
+    
+    # Suggestion chips based on subject
+    suggestions = SUBJECT_SUGGESTIONS.get(st.session_state.subject, SUBJECT_SUGGESTIONS["general"])
     
-    return None
+    # A single pills widget rather than a column and a button per suggestion
+    return st.pills(
+        "Try asking me",
+        options=suggestions,
+        selection_mode="single",
+        key="suggestion_pills",
+        label_visibility="collapsed"
+    )
+
+
+# Message bubble templates. Bubbles are joined into one markdown call, so the
+# HTML is kept flush-left with no blank lines: indented lines after a blank one
+# would be parsed as a code block and the following bubbles shown as raw HTML.
+USER_MESSAGE_HTML = """<div style="display: flex; justify-content: flex-end; margin-bottom: 1rem;">
+<div class="message-bubble user-message" {animation}>
+{content}
+</div>
+<div class="avatar user-avatar" style="margin-left: 0.75rem;">
+{avatar}
+</div>
+</div>"""
+
+BOT_MESSAGE_HTML = """<div style="display: flex; margin-bottom: 1rem;">
+<div class="avatar bot-avatar" style="margin-right: 0.75rem;">
+{avatar}
+</div>
+<div class="message-bubble bot-message" {animation}>
+{content}
+</div>
+</div>"""
+
+SLIDE_IN_STYLE = 'style="animation: slideIn 0.3s ease-out;"'
+
+
+def split_bubble(template: str, avatar: str, animated: bool):
+    """Fill in everything but the content, returning the HTML before and after it."""
+    filled = template.format(animation=SLIDE_IN_STYLE if animated else '', avatar=avatar, content="{content}")
+    head, _, tail = filled.partition("{content}")
+    return head, tail
+
+# (is_user, animated) -> (head, tail); a bubble is then head + content + tail
+BUBBLE_PARTS = {
+    (is_user, animated): split_bubble(USER_MESSAGE_HTML if is_user else BOT_MESSAGE_HTML,
+                                      USER_AVATAR if is_user else BOT_AVATAR, animated)
+    for is_user in (True, False) for animated in (True, False)
+}
+
+
+# Code fence line: up to three spaces, then ``` or ~~~ and an optional info string
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})(.*)$", re.MULTILINE)
+
+
+def close_open_fence(content: str) -> str:
+    """
+    Close a code fence left open at the end of a message.
+    
+    An interrupted stream or a model reply can leave one open; since bubbles
+    share one markdown call, it would otherwise swallow every later bubble.
+    """
+    if "```" not in content and "~~~" not in content:
+        return content
+    open_fence = None
+    for match in FENCE_RE.finditer(content):
+        fence, rest = match.groups()
+        if open_fence is None:
+            open_fence = fence
+        elif fence[0] == open_fence[0] and len(fence) >= len(open_fence) and not rest.strip():
+            open_fence = None
+    return content if open_fence is None else f"{content.rstrip()}\n{open_fence}"
+
+
+def message_html(role: str, content: str, show_animation: bool = False) -> str:
+    """Build the HTML for a single message bubble."""
+    head, tail = BUBBLE_PARTS[role == "user", show_animation]
+    return head + close_open_fence(content) + tail
 
 
 def render_message(role: str, content: str, show_animation: bool = False):
     """Render a single message bubble."""
-    if role == "user":
-        st.markdown(f"""
-        <div style="display: flex; justify-content: flex-end; margin-bottom: 1rem;">
-            <div class="message-bubble user-message" {'style="animation: slideIn 0.3s ease-out;"' if show_animation else ''}>
-                {content}
-            </div>
-            <div class="avatar user-avatar" style="margin-left: 0.75rem;">
-                {USER_AVATAR}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    else:
-        # Process markdown for bot messages
-        st.markdown(f"""
-        <div style="display: flex; margin-bottom: 1rem;">
-            <div class="avatar bot-avatar" style="margin-right: 0.75rem;">
-                {BOT_AVATAR}
-            </div>
-            <div class="message-bubble bot-message" {'style="animation: slideIn 0.3s ease-out;"' if show_animation else ''}>
-                {content}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown(message_html(role, content, show_animation), unsafe_allow_html=True)
+
+
+def render_messages(messages: list):
+    """Render every message bubble with one markdown call; the last two animate in."""
+    first_animated = len(messages) - 2
+    html = "\n".join(
+        message_html(msg["role"], msg["content"], i >= first_animated)
+        for i, msg in enumerate(messages)
+    )
+    st.markdown(html, unsafe_allow_html=True)
 
 
 def render_typing_indicator():
@@ -412,48 +554,73 @@ def render_typing_indicator():
     """, unsafe_allow_html=True)
 
 
+MAX_SESSION_BOTS = 8  # Conversations per browser session whose bots are kept for switching back
+
+
+def make_bot(session_id: str):
+    try:
+        # Try the full agent first
+        return KnowledgeBot(
+            session_id,
+            persist=False  # The app appends each turn to the history log itself
+        )
+    except Exception:
+        # Fall back to simple bot
+        return SimpleKnowledgeBot(session_id, persist=False)
+
+
 def get_or_create_bot():
-    """Get or create the bot instance."""
-    if st.session_state.bot is None:
-        try:
-            # Try the full agent first
-            st.session_state.bot = KnowledgeBot(
-                st.session_state.session_id,
-                subject=st.session_state.subject,
-                eli5_mode=st.session_state.eli5_mode
-            )
-        except Exception:
-            # Fall back to simple bot
-            st.session_state.bot = SimpleKnowledgeBot(
-                st.session_state.session_id,
-                subject=st.session_state.subject,
-                eli5_mode=st.session_state.eli5_mode
-            )
-    return st.session_state.bot
+    """
+    Get or create the bot instance for the open conversation.
+    
+    Bots live in this browser session's state, so subject and ELI5 mode can be
+    applied in place without affecting other sessions. The API client and the
+    embedding model they use are shared by the whole process.
+    """
+    bots = st.session_state.bots
+    session_id = st.session_state.session_id
+    bot = bots.get(session_id)
+    if bot is None:
+        bot = bots[session_id] = make_bot(session_id)
+        while len(bots) > MAX_SESSION_BOTS:
+            bots.popitem(last=False)
+    else:
+        bots.move_to_end(session_id)
+    if bot.subject != st.session_state.subject:
+        bot.set_subject(st.session_state.subject)
+    if bot.eli5_mode != st.session_state.eli5_mode:
+        bot.set_eli5_mode(st.session_state.eli5_mode)
+    return bot
 
 
-def process_message(user_input: str):
-    """Process user input and get bot response."""
+def process_message(user_input: str, placeholder):
+    """Process user input, streaming the bot response into `placeholder` as it arrives."""
     if not GOOGLE_API_KEY:
         return "⚠️ Please set your GOOGLE_API_KEY in the .env file to use Nova.", False
     
     bot = get_or_create_bot()
     
+    response = ""
     try:
-        response, used_tools, diagram = bot.chat(user_input)
-        
-        # Add tool indicator if tools were used
-        if used_tools:
-            response += "\n\n<span class='tool-indicator'>🔍 Searched for information</span>"
-        
-        return response, True
+        for chunk in bot.chat_stream(user_input):
+            response += chunk
+            placeholder.markdown(message_html("assistant", response), unsafe_allow_html=True)
     except Exception as e:
         return f"I'm sorry, I encountered an error: {str(e)}", False
+    
+    # Add tool indicator if tools were used
+    if bot.last_used_tools:
+        response += "\n\n<span class='tool-indicator'>🔍 Searched for information</span>"
+    
+    return response, True
 
 
 def main():
-    # Render sidebar and get any quick action
-    quick_action = render_sidebar()
+    # Render sidebar and pick up any quick action it queued
+    with st.sidebar:
+        render_sidebar()
+    quick_action = st.session_state.quick_action
+    st.session_state.quick_action = None
     
     # Main content area
     subject_info = SUBJECT_AREAS.get(st.session_state.subject, SUBJECT_AREAS["general"])
@@ -486,32 +653,10 @@ def main():
         "calculate": "Help me with a math calculation"
     }
     
-    if quick_action and quick_action in quick_action_prompts:
+    # Quick actions are sent like a typed message, further down
+    quick_input = quick_action_prompts.get(quick_action)
+    if quick_input:
         st.session_state.show_welcome = False
-        quick_input = quick_action_prompts[quick_action]
-        
-        # Add user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": quick_input
-        })
-        
-        # Get response
-        response, success = process_message(quick_input)
-        
-        # Add bot response
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response
-        })
-        
-        # Save to history
-        history_manager.save_conversation(
-            st.session_state.session_id,
-            st.session_state.messages
-        )
-        
-        st.rerun()
     
     # Welcome screen or chat
     suggestion_clicked = None
@@ -520,12 +665,19 @@ def main():
     
     # Display chat messages
     if st.session_state.messages:
+        # Only the most recent messages are rendered; older ones load on request
+        window = st.session_state.render_window
+        if len(st.session_state.messages) > window:
+            if st.button("Load older messages", key="load_older"):
+                st.session_state.render_window = window + RENDER_WINDOW
+                st.rerun()
         st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-        for i, msg in enumerate(st.session_state.messages):
-            show_animation = (i >= len(st.session_state.messages) - 2)
-            render_message(msg["role"], msg["content"], show_animation)
+        render_messages(st.session_state.messages[-window:])
         st.markdown('</div>', unsafe_allow_html=True)
     
+    # The turn being answered is drawn here while its response streams in
+    live_turn = st.container()
+    
     # Chat input
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -542,9 +694,9 @@ def main():
         with cols[1]:
             submit = st.form_submit_button("Send ➤", use_container_width=True)
     
-    # Handle suggestion click
-    if suggestion_clicked:
-        user_input = suggestion_clicked
+    # Handle suggestion click or quick action
+    if suggestion_clicked or quick_input:
+        user_input = suggestion_clicked or quick_input
         submit = True
     
     # Process input
@@ -557,9 +709,10 @@ def main():
             "content": user_input
         })
         
-        # Show typing indicator (will be replaced on rerun)
-        with st.spinner(""):
-            response, success = process_message(user_input)
+        # Show the question, then the answer as it streams in (both redrawn on rerun)
+        with live_turn:
+            st.markdown(message_html("user", user_input, show_animation=True), unsafe_allow_html=True)
+            response, success = process_message(user_input, st.empty())
         
         # Add bot response
         st.session_state.messages.append({
@@ -567,11 +720,8 @@ def main():
             "content": response
         })
         
-        # Save to history
-        history_manager.save_conversation(
-            st.session_state.session_id,
-            st.session_state.messages
-        )
+        # Save to history in the background
+        save_new_messages()
         
         st.rerun()
     
@@ -0,0 +1,448 @@
+"""
+Cache module for the Nova Educational Bot.
+Provides a semantic response cache so near-duplicate questions can be
+answered without another LLM call, and TTL caches for tool results.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import List, Optional
+
+from config import (
+    CACHE_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_ONNX_FILE,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_PCA_DIM, SEMANTIC_CACHE_PCA_MIN_ENTRIES, SEMANTIC_CACHE_DTYPE
+)
+
+# Optional dependencies - the semantic cache disables itself without them
+np = None
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+SentenceTransformer = None
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    pass
+
+ort = None
+try:
+    import onnxruntime as ort
+except ImportError:
+    pass
+
+_embedding_model = None
+
+TOOL_CACHE_DB = os.path.join(CACHE_DIR, "tool_cache.sqlite3")
+
+EMBED_MEMO_SIZE = 64  # Recent query embeddings reused without re-encoding
+SCORE_BLOCK_ROWS = 4096  # Rows widened per block when scoring a float16 matrix
+
+
+def _load_onnx_model():
+    """Load the int8-quantized ONNX export of the embedding model, or None if unavailable."""
+    if ort is None:
+        return None
+
+    # Leave half the cores for the tool calls that run alongside the encode
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+    try:
+        return SentenceTransformer(
+            EMBEDDING_MODEL_NAME,
+            backend="onnx",
+            model_kwargs={"file_name": EMBEDDING_ONNX_FILE, "session_options": session_options},
+        )
+    except Exception:
+        # Older sentence-transformers, optimum missing, or no ONNX file for this model
+        return None
+
+
+def get_embedding_model():
+    """Load the sentence embedding model once per process."""
+    global _embedding_model
+    if _embedding_model is None and SentenceTransformer is not None:
+        if EMBEDDING_BACKEND == "onnx":
+            _embedding_model = _load_onnx_model()
+        if _embedding_model is None:
+            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+
+def warmup_embedding_model():
+    """Load the embedding model and run one encode so the first query is fast."""
+    if not SEMANTIC_CACHE_ENABLED or np is None:
+        return
+    model = get_embedding_model()
+    if model is not None:
+        model.encode(["warm"], normalize_embeddings=True)
+
+
+def context_hash(*parts) -> str:
+    """Hash the values a cached response depends on besides the query itself."""
+    joined = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+def semantic_cache_path(session_id: str) -> str:
+    """Get the file path for a session's persisted semantic cache."""
+    return os.path.join(CACHE_DIR, f"{session_id}.npz")
+
+
+def delete_semantic_cache(session_id: str):
+    """Remove a session's persisted semantic cache, if it has one."""
+    try:
+        os.remove(semantic_cache_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+class SemanticCache:
+    """
+    Per-session cache of (query embedding, response) pairs.
+
+    Embeddings are L2-normalized and stored in one preallocated, contiguous
+    matrix, so a single matrix-vector product gives the cosine similarity
+    against every cached query. Entries expire after a TTL and the least
+    recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.enabled = SEMANTIC_CACHE_ENABLED and np is not None and SentenceTransformer is not None
+        self.threshold = SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = SEMANTIC_CACHE_MAX_ENTRIES
+        self.ttl = SEMANTIC_CACHE_TTL
+        self.dtype = np.dtype(SEMANTIC_CACHE_DTYPE) if np is not None else None
+
+        # Row-aligned buffers with room for one entry past max_entries; only
+        # the first `_n` rows are live
+        self._n = 0
+        self._E = None  # (capacity, d) matrix of cached query embeddings
+        self.responses: List[str] = []
+        self._context_hashes = None
+        self._created_at = None
+        self._last_used = None
+        self._scratch = None  # float32 block used to score a float16 matrix
+
+        # Recently embedded queries, so repeated text skips the model
+        self._embed_memo = OrderedDict()
+
+        # PCA projection, fitted once enough entries have been collected
+        self._pca_mean = None
+        self._pca_components = None
+
+        if self.enabled:
+            self._load_from_disk()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _get_filepath(self) -> str:
+        """Get the file path for this session's cache."""
+        return semantic_cache_path(self.session_id)
+
+    def embed(self, text: str):
+        """Embed a query, returning None when the cache is unavailable."""
+        if not self.enabled:
+            return None
+
+        key = text.strip().lower()
+        embedding = self._embed_memo.get(key)
+        if embedding is not None:
+            self._embed_memo.move_to_end(key)
+            return embedding
+
+        try:
+            model = get_embedding_model()
+            embedding = model.encode(text, normalize_embeddings=True)
+        except Exception:
+            # Model download/load failed - fall back to always calling the LLM
+            self.enabled = False
+            return None
+
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self._embed_memo[key] = embedding
+        while len(self._embed_memo) > EMBED_MEMO_SIZE:
+            self._embed_memo.popitem(last=False)
+        return embedding
+
+    def _project(self, embedding):
+        """Map a raw embedding into the cache's (possibly PCA-reduced) space."""
+        if self._pca_components is None:
+            return embedding
+        reduced = (embedding - self._pca_mean) @ self._pca_components.T
+        norm = np.linalg.norm(reduced, axis=-1, keepdims=True)
+        return (reduced / np.maximum(norm, 1e-12)).astype(np.float32)
+
+    def _allocate(self, dim: int, capacity: int):
+        """Allocate empty row buffers for `capacity` entries of size `dim`."""
+        self._E = np.empty((capacity, dim), dtype=self.dtype)
+        self._context_hashes = np.empty(capacity, dtype="<U40")
+        self._created_at = np.empty(capacity, dtype=np.float64)
+        self._last_used = np.empty(capacity, dtype=np.float64)
+        self._scratch = None
+
+    def _scores(self, query):
+        """Cosine similarity of `query` against every live row."""
+        E = self._E[:self._n]
+        if E.dtype == np.float32:
+            return E @ query
+
+        # NumPy has no float16 BLAS, so widen the matrix in cache-sized
+        # blocks and score each block with a float32 GEMV
+        if self._scratch is None:
+            self._scratch = np.empty((SCORE_BLOCK_ROWS, E.shape[1]), dtype=np.float32)
+        scores = np.empty(self._n, dtype=np.float32)
+        for start in range(0, self._n, SCORE_BLOCK_ROWS):
+            block = E[start:start + SCORE_BLOCK_ROWS]
+            widened = self._scratch[:len(block)]
+            widened[...] = block
+            np.dot(widened, query, out=scores[start:start + len(block)])
+        return scores
+
+    def lookup(self, embedding, ctx_hash: str) -> Optional[str]:
+        """Return a cached response for a similar query in the same context."""
+        if embedding is None or not self._n:
+            return None
+
+        self._expire()
+        if not self._n:
+            return None
+
+        scores = self._scores(self._project(embedding))
+        scores[self._context_hashes[:self._n] != ctx_hash] = -1.0
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            return None
+
+        self._last_used[best] = time.time()
+        return self.responses[best]
+
+    def add(self, embedding, ctx_hash: str, response: str):
+        """Cache a response and persist the cache to disk."""
+        if embedding is None:
+            return
+
+        now = time.time()
+        row = self._project(embedding)
+
+        if self._E is None:
+            self._allocate(row.shape[0], self.max_entries + 1)
+        elif self._n == len(self._E):
+            self._evict_lru()
+
+        i = self._n
+        self._E[i] = row
+        self._context_hashes[i] = ctx_hash
+        self._created_at[i] = now
+        self._last_used[i] = now
+        self.responses.append(response)
+        self._n += 1
+
+        self._expire()
+        while self._n > self.max_entries:
+            self._evict_lru()
+
+        if (self._pca_components is None
+                and self._n >= SEMANTIC_CACHE_PCA_MIN_ENTRIES
+                and self._E.shape[1] > SEMANTIC_CACHE_PCA_DIM):
+            self._fit_pca()
+
+        self._save_to_disk()
+
+    def clear(self):
+        """Drop every cached entry."""
+        self._n = 0
+        self._E = None
+        self.responses = []
+        self._context_hashes = None
+        self._created_at = None
+        self._last_used = None
+        self._scratch = None
+        self._embed_memo.clear()
+        self._pca_mean = None
+        self._pca_components = None
+
+        delete_semantic_cache(self.session_id)
+
+    def _expire(self):
+        """Remove entries older than the TTL."""
+        if not self._n:
+            return
+        expired = np.flatnonzero(time.time() - self._created_at[:self._n] > self.ttl)
+        if len(expired):
+            self._remove(expired)
+
+    def _evict_lru(self):
+        """Remove the least recently used entry."""
+        self._remove([int(np.argmin(self._last_used[:self._n]))])
+
+    def _remove(self, indices):
+        """Remove the given rows, compacting every buffer in place."""
+        keep = np.ones(self._n, dtype=bool)
+        keep[indices] = False
+        kept = np.flatnonzero(keep)
+        m = len(kept)
+        for buf in (self._E, self._context_hashes, self._created_at, self._last_used):
+            buf[:m] = buf[kept]
+        self.responses = [r for r, k in zip(self.responses, keep) if k]
+        self._n = m
+
+    def _fit_pca(self):
+        """Fit a PCA projection on the cached embeddings and shrink the matrix."""
+        E = self._E[:self._n].astype(np.float32)
+        mean = E.mean(axis=0)
+        _, _, vt = np.linalg.svd(E - mean, full_matrices=False)
+        self._pca_mean = mean.astype(np.float32)
+        self._pca_components = vt[:SEMANTIC_CACHE_PCA_DIM].astype(np.float32)
+
+        reduced = self._project(E)
+        hashes = self._context_hashes[:self._n].copy()
+        created_at = self._created_at[:self._n].copy()
+        last_used = self._last_used[:self._n].copy()
+        self._allocate(reduced.shape[1], len(self._E))
+        self._E[:self._n] = reduced
+        self._context_hashes[:self._n] = hashes
+        self._created_at[:self._n] = created_at
+        self._last_used[:self._n] = last_used
+        self._embed_memo.clear()
+
+    def _save_to_disk(self):
+        """Persist the cache so warm restarts reuse previous embeddings."""
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        n = self._n
+        arrays = {
+            "E": self._E[:n],
+            "responses": np.array(self.responses, dtype=np.str_),
+            "context_hashes": self._context_hashes[:n],
+            "created_at": self._created_at[:n],
+            "last_used": self._last_used[:n],
+        }
+        if self._pca_components is not None:
+            arrays["pca_mean"] = self._pca_mean
+            arrays["pca_components"] = self._pca_components
+
+        try:
+            np.savez_compressed(self._get_filepath(), **arrays)
+        except OSError:
+            pass
+
+    def _load_from_disk(self):
+        """Load a previously persisted cache for this session."""
+        filepath = self._get_filepath()
+        if not os.path.exists(filepath):
+            return
+
+        try:
+            with np.load(filepath, allow_pickle=False) as data:
+                E = data["E"]
+                n = len(E)
+                self._allocate(E.shape[1], max(self.max_entries, n) + 1)
+                self._E[:n] = E
+                self._context_hashes[:n] = data["context_hashes"]
+                self._created_at[:n] = data["created_at"]
+                self._last_used[:n] = data["last_used"]
+                self.responses = [str(r) for r in data["responses"]]
+                self._n = n
+                if "pca_components" in data:
+                    self._pca_mean = data["pca_mean"]
+                    self._pca_components = data["pca_components"]
+        except Exception:
+            self.clear()
+            return
+
+        self._expire()
+        while self._n > self.max_entries:
+            self._evict_lru()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds (None = never)."""
+
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if it is missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, stored_at: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[tuple]:
+        """Snapshot of (key, value, stored_at) for persistence."""
+        with self._lock:
+            return [(key, value, stored_at) for key, (value, stored_at) in self._data.items()]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def load_tool_caches(caches: List[TTLCache]):
+    """Warm tool caches from the SQLite file written on the last shutdown."""
+    if not os.path.exists(TOOL_CACHE_DB):
+        return
+
+    try:
+        with closing(sqlite3.connect(TOOL_CACHE_DB)) as conn:
+            for cache in caches:
+                rows = conn.execute(
+                    "SELECT key, value, stored_at FROM tool_cache WHERE name = ? ORDER BY stored_at",
+                    (cache.name,)
+                )
+                for key, value, stored_at in rows:
+                    if cache.ttl is None or time.time() - stored_at <= cache.ttl:
+                        cache.set(key, value, stored_at)
+    except sqlite3.Error:
+        pass
+
+
+def save_tool_caches(caches: List[TTLCache]):
+    """Persist tool caches to SQLite so they survive restarts."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with closing(sqlite3.connect(TOOL_CACHE_DB)) as conn:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS tool_cache ("
+                    "name TEXT, key TEXT, value TEXT, stored_at REAL, PRIMARY KEY (name, key))"
+                )
+                conn.execute("DELETE FROM tool_cache")
+                for cache in caches:
+                    conn.executemany(
+                        "INSERT INTO tool_cache VALUES (?, ?, ?, ?)",
+                        [(cache.name, key, value, stored_at) for key, value, stored_at in cache.items()]
+                    )
+    except (OSError, sqlite3.Error):
+        pass
@@ -17,14 +17,50 @@ MODEL_NAME = "gemini-2.5-flash"
 TEMPERATURE = 0.7
 MAX_TOKENS = 2048
 
+# Client-side rate limit for Gemini calls, shared by every session in the process
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "10"))  # 0 disables the limiter
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))  # Calls allowed back to back before pacing starts
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "30"))  # seconds; longer waits go straight to the API
+
+# Warm up API connections and the embedding model when the app starts
+WARMUP_ON_START = os.getenv("WARMUP", "1") == "1"
+
 # Chat History Configuration
 CHAT_HISTORY_DIR = "chat_history"
 MAX_HISTORY_LENGTH = 50  # Maximum messages to keep in memory
+RENDER_WINDOW = 50  # Messages shown in the chat pane before "Load older messages"
+HISTORY_SAVE_DEBOUNCE = 2.0  # Seconds a self-persisting memory waits to batch turns into one write
+INDEX_REBUILD_WORKERS = 8  # Threads reading conversation files when the history index is rebuilt
+
+# Semantic Cache Configuration
+CACHE_DIR = "cache"
+SEMANTIC_CACHE_ENABLED = True
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")  # "onnx" or "torch"
+EMBEDDING_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"  # int8-quantized export shipped with the model
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Minimum cosine similarity for a cache hit
+SEMANTIC_CACHE_MAX_ENTRIES = 256  # Least recently used entries are evicted first
+SEMANTIC_CACHE_TTL = 3600  # Seconds before a cached response expires
+SEMANTIC_CACHE_PCA_DIM = 64  # Embedding size after PCA reduction
+SEMANTIC_CACHE_PCA_MIN_ENTRIES = 128  # Entries collected before PCA is fitted
+SEMANTIC_CACHE_DTYPE = os.getenv("SEMANTIC_CACHE_DTYPE", "float32")  # "float16" halves memory per entry
+
+# HTTP Configuration for tool calls
+HTTP_TIMEOUT = 10.0  # seconds
+HTTP_MAX_CONNECTIONS = 64
+
+# Build prompts with functions generated from the templates (0 = Template.substitute)
+PROMPT_CODEGEN = os.getenv("PROMPT_CODEGEN", "1") == "1"
+
+# Classify requests with the Numba-compiled keyword scanner (requires numba)
+NUMBA_CLASSIFIER = os.getenv("NUMBA_CLASSIFIER", "0") == "1"
+
+# Tool Cache Configuration
+TOOL_CACHE_MAX_ENTRIES = 512
+TOOL_CACHE_TTL = 600  # Seconds before a cached search result expires
+WIKI_CACHE_TTL = 7 * 24 * 3600  # Encyclopedia summaries change slowly, so they are kept for a week
 
 # Bot Configuration
 BOT_NAME = "Nova"
 BOT_AVATAR = "🤖"
 USER_AVATAR = "👤"
-
-# Ensure chat history directory exists
-os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
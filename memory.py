@@ -3,16 +3,64 @@ Memory module for the Conversational Knowledge Bot.
 Handles conversation memory and persistent storage.
 """
 
+import atexit
+import base64
+import heapq
 import json
 import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import BinaryIO, List, Dict, Optional, Tuple
 
-from config import CHAT_HISTORY_DIR, MAX_HISTORY_LENGTH
+from config import CHAT_HISTORY_DIR, MAX_HISTORY_LENGTH, HISTORY_SAVE_DEBOUNCE, INDEX_REBUILD_WORKERS
+
+INDEX_FILENAME = "_index.json"
+DATE_FORMAT = "%b %d, %I:%M %p"  # As shown in the sidebar
+
+# Serializes index updates from the app and the background memory writers
+_index_lock = threading.RLock()
+
+# Append handles for recently written logs, so a turn costs one write instead of open/write/close.
+# Closed before a log is replaced or deleted, so no handle ever points at a stale file.
+MAX_OPEN_LOGS = 16
+_log_handles: "OrderedDict[str, BinaryIO]" = OrderedDict()
+
+# Legacy file paths known not to exist (never written again), so saves skip the check
+_no_legacy_file = set()
+
+# Parsed summary indexes by path, with the (inode, mtime, size) stamp they were read at
+_index_cache: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Dict]]] = {}
+
+
+# Memories with turns waiting for their debounced save, flushed at exit
+_unsaved_memories = weakref.WeakSet()
+
+
+def _flush_unsaved_memories():
+    for memory in list(_unsaved_memories):
+        memory.flush()
+
+
+atexit.register(_flush_unsaved_memories)
+
+
+# Chat memory message types -> saved roles; anything else is the bot
+_ROLE_MAP = {"human": "user", "ai": "assistant"}
+
+
+def _to_dicts(messages) -> List[Dict]:
+    """Serialize chat memory messages in the saved {role, content} form."""
+    return [{"role": _ROLE_MAP.get(msg.type, "assistant"), "content": msg.content} for msg in messages]
 
 
 # Simple message class for fallback
 class SimpleMessage:
+    __slots__ = ('content', 'type')  # No per-message __dict__
+    
     def __init__(self, content: str, msg_type: str):
         self.content = content
         self.type = msg_type
@@ -40,99 +88,450 @@ except ImportError:
     except ImportError:
         pass  # Will use fallback
 
+# Optional dependency - faster (de)serialization of history files
+orjson = None
+try:
+    import orjson
+except ImportError:
+    pass
+
+
+def _dumps(obj) -> bytes:
+    """Serialize to UTF-8 encoded JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 
 class ChatHistoryManager:
-    """Manages persistent chat history storage."""
+    """
+    Manages persistent chat history storage.
+    
+    Each conversation is an append-only JSON Lines log with one message per
+    line, after a header line holding its `created_at`; `_index.json`
+    alongside them holds every conversation's title, timestamps and message
+    count, so the sidebar can be built from one read.
+    Conversations saved as a single `.json` file by older versions are still
+    read, and are converted to a log the next time they are written.
+    """
+    
+    _ready_dirs = set()  # History directories already created by this process
     
     def __init__(self):
         self.history_dir = CHAT_HISTORY_DIR
-        os.makedirs(self.history_dir, exist_ok=True)
+        self.index_path = os.path.join(self.history_dir, INDEX_FILENAME)
+        if self.history_dir not in ChatHistoryManager._ready_dirs:
+            os.makedirs(self.history_dir, exist_ok=True)
+            ChatHistoryManager._ready_dirs.add(self.history_dir)
     
     def _get_filepath(self, session_id: str) -> str:
-        """Get the file path for a session's history."""
+        """Get the file path for a session's message log."""
+        return os.path.join(self.history_dir, f"{session_id}.jsonl")
+    
+    def _get_legacy_filepath(self, session_id: str) -> str:
+        """Get the file path for a session saved as a single JSON document."""
         return os.path.join(self.history_dir, f"{session_id}.json")
     
-    def save_conversation(self, session_id: str, messages: List[Dict], title: str = None):
-        """Save conversation to disk."""
-        filepath = self._get_filepath(session_id)
+    def _write_json(self, filepath: str, data):
+        """Write to a temp file and swap it in, so concurrent saves never leave a partial file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.history_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_dumps(data))
+            os.replace(tmp_path, filepath)
+        except:
+            os.remove(tmp_path)
+            raise
+    
+    @staticmethod
+    def _log_header(created_at: Optional[str]) -> bytes:
+        """First line of a log; it has no "role", which is how readers tell it from a message."""
+        return _dumps({"created_at": created_at}) + b"\n"
+    
+    def _write_log(self, filepath: str, messages: List[Dict], created_at: Optional[str]):
+        """Replace a message log atomically."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.history_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._log_header(created_at) + b"".join(_dumps(m) + b"\n" for m in messages))
+            self._close_log(filepath)
+            os.replace(tmp_path, filepath)
+        except:
+            os.remove(tmp_path)
+            raise
+    
+    @staticmethod
+    def _log_handle(filepath: str):
+        """Open append handle for a log, reusing the one from the previous write."""
+        with _index_lock:
+            f = _log_handles.get(filepath)
+            if f is not None:
+                _log_handles.move_to_end(filepath)
+                return f
+            f = _log_handles[filepath] = open(filepath, 'ab')
+            if len(_log_handles) > MAX_OPEN_LOGS:
+                _log_handles.popitem(last=False)[1].close()
+            return f
+    
+    @staticmethod
+    def _close_log(filepath: str):
+        with _index_lock:
+            f = _log_handles.pop(filepath, None)
+            if f is not None:
+                f.close()
+    
+    @staticmethod
+    def _read_log(filepath: str) -> List[Dict]:
+        """Read every message in a log, skipping its header and a torn final line."""
+        messages = []
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        for line in data.splitlines():
+            try:
+                message = _loads(line)
+            except ValueError:
+                continue
+            if "role" in message:
+                messages.append(message)
+        return messages
+    
+    @staticmethod
+    def _scan_log(filepath: str) -> Tuple[Optional[str], int, Optional[str]]:
+        """
+        Title, message count and creation time of a log.
         
-        # Generate title from first message if not provided
-        if not title and messages:
-            first_user_msg = next((m for m in messages if m.get("role") == "user"), None)
-            if first_user_msg:
-                title = first_user_msg.get("content", "")[:50] + "..."
+        Messages are only parsed up to the first user message. Logs written
+        before the header was added have no creation time.
+        """
+        with open(filepath, 'rb') as f:
+            lines = f.read().splitlines()
+        if lines:
+            try:
+                _loads(lines[-1])
+            except ValueError:
+                lines.pop()  # Torn final line
+        created_at = None
+        if lines:
+            try:
+                first = _loads(lines[0])
+            except ValueError:
+                first = {}
+            if "role" not in first:
+                created_at = first.get("created_at")
+                lines = lines[1:]
+        for line in lines:
+            try:
+                message = _loads(line)
+            except ValueError:
+                continue
+            if message.get("role") == "user":
+                return ChatHistoryManager._make_title([message]), len(lines), created_at
+        return None, len(lines), created_at
+    
+    @staticmethod
+    def _make_title(messages: List[Dict]) -> Optional[str]:
+        """Generate a title from the first user message."""
+        first_user_msg = next((m for m in messages if m.get("role") == "user"), None)
+        if first_user_msg:
+            return first_user_msg.get("content", "")[:50] + "..."
+        return None
+    
+    def save_conversation(self, session_id: str, messages: List[Dict], title: str = None):
+        """Save a conversation to disk, replacing whatever was stored for it."""
+        messages = messages[-MAX_HISTORY_LENGTH:]  # Keep only recent messages
+        now_dt = datetime.now()
+        now = now_dt.isoformat()
         
-        data = {
-            "session_id": session_id,
-            "title": title or "New Conversation",
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-            "messages": messages[-MAX_HISTORY_LENGTH:]  # Keep only recent messages
-        }
+        with _index_lock:
+            index = self._read_index()
+            entry = self._migrate_legacy(session_id) or index.get(session_id) or {}
+            created_at = entry.get("created_at") or now  # Preserve original created_at
+            
+            self._write_log(self._get_filepath(session_id), messages, created_at)
+            index[session_id] = {
+                "session_id": session_id,
+                "title": title or self._make_title(messages) or "New Conversation",
+                "created_at": created_at,
+                "updated_at": now,
+                "date_str": now_dt.strftime(DATE_FORMAT),
+                "message_count": len(messages)
+            }
+            self._write_index(index)
+    
+    def clear_conversation(self, session_id: str):
+        """Empty a saved conversation, leaving sessions that were never saved untouched."""
+        with _index_lock:
+            if (os.path.exists(self._get_filepath(session_id))
+                    or os.path.exists(self._get_legacy_filepath(session_id))):
+                self.save_conversation(session_id, [])
+    
+    def append_messages(self, session_id: str, messages: List[Dict], title: str = None):
+        """
+        Append new messages to a conversation's log.
         
-        # Preserve original created_at if file exists
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    existing = json.load(f)
-                    data["created_at"] = existing.get("created_at", data["created_at"])
-            except:
-                pass
+        Only the new lines are written. Once the log holds twice
+        MAX_HISTORY_LENGTH messages it is compacted down to the most recent ones.
+        """
+        if not messages:
+            return
+        now_dt = datetime.now()
+        now = now_dt.isoformat()
+        filepath = self._get_filepath(session_id)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with _index_lock:
+            index = self._read_index()
+            entry = self._migrate_legacy(session_id) or index.get(session_id) or {}
+            created_at = entry.get("created_at") or now
+            
+            f = self._log_handle(filepath)
+            data = b"".join(_dumps(m) + b"\n" for m in messages)
+            if f.tell() == 0:
+                data = self._log_header(created_at) + data  # A new log starts with its header
+            f.write(data)
+            f.flush()
+            message_count = entry.get("message_count", 0) + len(messages)
+            
+            if message_count >= 2 * MAX_HISTORY_LENGTH:
+                recent = self._read_log(filepath)[-MAX_HISTORY_LENGTH:]
+                self._write_log(filepath, recent, created_at)
+                message_count = len(recent)
+            
+            index[session_id] = {
+                "session_id": session_id,
+                "title": title or entry.get("title") or self._make_title(messages) or "New Conversation",
+                "created_at": created_at,
+                "updated_at": now,
+                "date_str": now_dt.strftime(DATE_FORMAT),
+                "message_count": message_count
+            }
+            self._write_index(index)
+    
+    def _migrate_legacy(self, session_id: str) -> Optional[Dict]:
+        """Convert an old single-document save into a log, returning its summary (None if there is none)."""
+        legacy_path = self._get_legacy_filepath(session_id)
+        if legacy_path in _no_legacy_file:
+            return None
+        if not os.path.exists(legacy_path):
+            _no_legacy_file.add(legacy_path)
+            return None
+        try:
+            with open(legacy_path, 'rb') as f:
+                data = _loads(f.read())
+        except:
+            return None
+        self._write_log(self._get_filepath(session_id), data.get("messages", []), data.get("created_at"))
+        os.remove(legacy_path)
+        _no_legacy_file.add(legacy_path)
+        return self._summarize(data)
     
     def load_conversation(self, session_id: str) -> Optional[Dict]:
         """Load conversation from disk."""
-        filepath = self._get_filepath(session_id)
+        # Open files directly instead of checking for them first: one syscall fewer
+        try:
+            messages = self._read_log(self._get_filepath(session_id))
+        except FileNotFoundError:
+            messages = None
+        except OSError:
+            return None
+        if messages is not None:
+            entry = self._read_index().get(session_id, {})
+            return {
+                "session_id": session_id,
+                "title": entry.get("title") or self._make_title(messages) or "New Conversation",
+                "created_at": entry.get("created_at"),
+                "updated_at": entry.get("updated_at"),
+                "messages": messages[-MAX_HISTORY_LENGTH:]
+            }
         
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return None
-        return None
+        try:
+            with open(self._get_legacy_filepath(session_id), 'rb') as f:
+                return _loads(f.read())
+        except:
+            return None
     
     def get_all_conversations(self) -> List[Dict]:
         """Get all saved conversations, sorted by most recent."""
-        conversations = []
-        
-        for filename in os.listdir(self.history_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.history_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        conversations.append({
-                            "session_id": data.get("session_id"),
-                            "title": data.get("title", "Untitled"),
-                            "created_at": data.get("created_at"),
-                            "updated_at": data.get("updated_at"),
-                            "message_count": len(data.get("messages", []))
-                        })
-                except:
-                    continue
+        conversations = list(self._read_index().values())
         
         # Sort by updated_at, most recent first
-        conversations.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
+        conversations.sort(key=lambda x: x.get("updated_at") or "", reverse=True)
         return conversations
     
+    def list_page(self, cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of saved conversations, most recently updated first.
+        
+        Pages are cut from the summary index, ordered by (updated_at, session_id).
+        Pass the returned cursor to get the next page; it is None after the last page.
+        """
+        conversations = self._read_index().values()
+        
+        if cursor:
+            position = self._decode_cursor(cursor)
+            conversations = [c for c in conversations if self._page_key(c) < position]
+        
+        # One extra entry tells us whether there is another page
+        newest = heapq.nlargest(limit + 1, conversations, key=self._page_key)
+        page = newest[:limit]
+        
+        next_cursor = None
+        if len(newest) > limit:
+            next_cursor = self._encode_cursor(*self._page_key(page[-1]))
+        return page, next_cursor
+    
     def delete_conversation(self, session_id: str) -> bool:
         """Delete a conversation."""
-        filepath = self._get_filepath(session_id)
+        with _index_lock:
+            index = self._read_index()
+            removed = index.pop(session_id, None) is not None
+            for filepath in (self._get_filepath(session_id), self._get_legacy_filepath(session_id)):
+                self._close_log(filepath)
+                try:
+                    os.remove(filepath)
+                    removed = True
+                except FileNotFoundError:
+                    pass
+            if removed:
+                self._write_index(index)
+        return removed
+    
+    @staticmethod
+    def _stamp(stat: os.stat_result) -> Tuple[int, int, int]:
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    def _read_index(self) -> Dict[str, Dict]:
+        """
+        Load the summary index, rebuilding it from the conversation files if it is missing.
+        
+        The parsed index is kept until the file changes, so repeat reads cost one stat.
+        Callers get their own copy of the mapping to modify.
+        """
+        try:
+            cached = _index_cache.get(self.index_path)
+            if cached is not None and cached[0] == self._stamp(os.stat(self.index_path)):
+                return dict(cached[1])
+            with open(self.index_path, 'rb') as f:
+                stamp = self._stamp(os.fstat(f.fileno()))
+                index = _loads(f.read())
+        except (OSError, ValueError):
+            return self._rebuild_index()
+        _index_cache[self.index_path] = (stamp, index)
+        return dict(index)
+    
+    def _rebuild_index(self) -> Dict[str, Dict]:
+        """
+        Summarize every conversation on disk and write a fresh index.
         
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            return True
-        return False
+        Files are read on a small thread pool so their I/O overlaps. A log
+        wins over a legacy file with the same session id, which is skipped unread.
+        """
+        with _index_lock:
+            with os.scandir(self.history_dir) as it:
+                logs, legacy = [], []
+                for entry in it:
+                    try:
+                        if not entry.is_file():  # Answered from the directory listing on most platforms
+                            continue
+                    except OSError:
+                        continue
+                    if entry.name.endswith('.jsonl'):
+                        logs.append(entry)
+                    elif entry.name.endswith('.json') and entry.name != INDEX_FILENAME:
+                        legacy.append(entry)
+            log_ids = {entry.name[:-len('.jsonl')] for entry in logs}
+            entries = logs + [e for e in legacy if e.name[:-len('.json')] not in log_ids]
+            
+            index = {}
+            if entries:
+                with ThreadPoolExecutor(max_workers=min(INDEX_REBUILD_WORKERS, len(entries))) as pool:
+                    for summary in pool.map(self._summarize_entry, entries):
+                        if summary is not None:
+                            index.setdefault(summary["session_id"], summary)
+            self._write_index(index)
+            return index
+    
+    def _summarize_entry(self, entry: os.DirEntry) -> Optional[Dict]:
+        """Index entry for one conversation file, or None if it cannot be read."""
+        try:
+            if entry.name.endswith('.jsonl'):
+                # The header only holds created_at; title and count come from the messages, the update time from the file
+                session_id = entry.name[:-len('.jsonl')]
+                title, message_count, created_at = self._scan_log(entry.path)
+                stat = entry.stat()
+                updated = datetime.fromtimestamp(stat.st_mtime)
+                return {
+                    "session_id": session_id,
+                    "title": title or "New Conversation",
+                    "created_at": created_at,  # st_ctime is the last inode change on Linux, not creation
+                    "updated_at": updated.isoformat(),
+                    "date_str": updated.strftime(DATE_FORMAT),
+                    "message_count": message_count
+                }
+            with open(entry.path, 'rb') as f:
+                summary = self._summarize(_loads(f.read()))
+            summary["session_id"] = summary["session_id"] or entry.name[:-len('.json')]
+            return summary
+        except:
+            return None
+    
+    def _write_index(self, index: Dict[str, Dict]):
+        try:
+            self._write_json(self.index_path, index)
+        except OSError:
+            pass  # The next read rebuilds it from the conversation files
+    
+    @staticmethod
+    def _summarize(data: Dict) -> Dict:
+        """Sidebar summary of a saved conversation."""
+        return {
+            "session_id": data.get("session_id"),
+            "title": data.get("title", "Untitled"),
+            "created_at": data.get("created_at"),
+            "updated_at": data.get("updated_at"),
+            "date_str": ChatHistoryManager._format_date(data.get("updated_at")),
+            "message_count": len(data.get("messages", []))
+        }
+    
+    @staticmethod
+    def _format_date(timestamp: Optional[str]) -> str:
+        try:
+            return datetime.fromisoformat(timestamp).strftime(DATE_FORMAT)
+        except (TypeError, ValueError):
+            return "Unknown"
+    
+    @staticmethod
+    def _page_key(summary: Dict) -> Tuple[str, str]:
+        return summary.get("updated_at") or "", summary.get("session_id") or ""
+    
+    @staticmethod
+    def _encode_cursor(updated_at: str, session_id: str) -> str:
+        raw = json.dumps([updated_at, session_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str]:
+        updated_at, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return updated_at, session_id
 
 
 class ConversationMemory:
-    """Wrapper around LangChain's ConversationBufferMemory with persistence."""
+    """
+    Wrapper around LangChain's ConversationBufferMemory with persistence.
+    
+    With `persist=False` the saved history is still loaded, but new
+    interactions are only kept in memory - for callers that write the
+    history themselves. Otherwise turns are saved at most every
+    HISTORY_SAVE_DEBOUNCE seconds, batching quick exchanges into one append;
+    `flush` writes immediately.
+    """
     
-    def __init__(self, session_id: str):
+    def __init__(self, session_id: str, persist: bool = True):
         self.session_id = session_id
+        self.persist = persist
         self.history_manager = ChatHistoryManager()
         self._use_langchain = ConversationBufferMemory is not None
         
@@ -149,6 +548,9 @@ class ConversationMemory:
             self.chat_memory = SimpleChatMemory()
         
         self._load_from_disk()
+        self._persisted_count = len(self.chat_memory.messages)  # Messages already in the log
+        self._save_lock = threading.Lock()
+        self._save_timer = None
     
     def _load_from_disk(self):
         """Load conversation history from disk into memory."""
@@ -165,37 +567,54 @@ class ConversationMemory:
         """Add a new interaction to memory and save to disk."""
         self.chat_memory.add_user_message(user_input)
         self.chat_memory.add_ai_message(bot_response)
-        self._save_to_disk()
+        if self.persist:
+            self._schedule_save()
+    
+    def _schedule_save(self):
+        """Arm the save timer; turns added before it fires go out in the same write."""
+        with self._save_lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(HISTORY_SAVE_DEBOUNCE, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+                _unsaved_memories.add(self)
+    
+    def flush(self):
+        """Write any turns that are not on disk yet."""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            _unsaved_memories.discard(self)
+            if self._persisted_count < len(self.chat_memory.messages):
+                self._save_to_disk()
     
     def _save_to_disk(self):
-        """Save current memory state to disk."""
-        messages = []
-        for msg in self.chat_memory.messages:
-            role = "user" if msg.type == "human" else "assistant"
-            messages.append({
-                "role": role,
-                "content": msg.content
-            })
-        
-        self.history_manager.save_conversation(self.session_id, messages)
+        """Append the messages added since the last save to the log on disk."""
+        messages = _to_dicts(self.chat_memory.messages[self._persisted_count:])
+        self.history_manager.append_messages(self.session_id, messages)
+        self._persisted_count += len(messages)
     
     def get_messages(self) -> List[Dict]:
         """Get all messages in current memory."""
-        messages = []
-        for msg in self.chat_memory.messages:
-            role = "user" if msg.type == "human" else "assistant"
-            messages.append({
-                "role": role,
-                "content": msg.content
-            })
-        return messages
+        return _to_dicts(self.chat_memory.messages)
     
     def clear(self):
-        """Clear memory."""
-        if self._use_langchain:
-            self.memory.clear()
-        else:
-            self.chat_memory.messages = []
+        """Clear memory, and the saved history too when this memory persists itself."""
+        with self._save_lock:
+            # Turns still waiting for their save are dropped along with the rest
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            _unsaved_memories.discard(self)
+            if self._use_langchain:
+                self.memory.clear()
+            else:
+                self.chat_memory.messages = []
+            self._persisted_count = 0
+            if self.persist:
+                # The log is append-only, so it has to be emptied or later turns land after the old ones
+                self.history_manager.clear_conversation(self.session_id)
     
     def get_langchain_memory(self) -> ConversationBufferMemory:
         """Get the underlying LangChain memory object."""
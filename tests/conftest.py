@@ -0,0 +1,21 @@
+"""
+Shared test setup: a dummy API key, and scratch directories so the history,
+cache and tool-cache files the modules write never land in the repo.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# agent.py creates its API client at import, which needs some key
+if not os.environ.get("GOOGLE_API_KEY"):
+    os.environ["GOOGLE_API_KEY"] = "test-key"
+
+import config
+
+# Patched before the other modules import these paths (tool caches are also saved at exit)
+_SCRATCH = tempfile.mkdtemp(prefix="nova-tests-")
+config.CACHE_DIR = os.path.join(_SCRATCH, "cache")
+config.CHAT_HISTORY_DIR = os.path.join(_SCRATCH, "chat_history")
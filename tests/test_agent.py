@@ -0,0 +1,196 @@
+"""
+Tests for the request handling in agent.py that runs before the model is called.
+"""
+
+from string import Template
+
+import numpy as np
+import pytest
+
+import agent
+from _hot import keyword_bits
+
+
+@pytest.fixture(autouse=True)
+def offline_tools(monkeypatch):
+    """Answer searches locally and start every test with empty tool caches."""
+    monkeypatch.setattr(agent, "search_wikipedia", lambda query: f"📚 **{query}**\n\nSummary.")
+    monkeypatch.setattr(agent, "search_web", lambda query: "No web results found.")
+    for cache in agent._TOOL_CACHES:
+        cache.clear()
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """A bot whose semantic cache embeds text with a fixed lookup table instead of a model."""
+    bot = agent.SimpleKnowledgeBot("test-session", persist=False)
+    vectors = {}
+    
+    def embed(text):
+        key = text.strip().lower()
+        if key not in vectors:
+            vector = np.zeros(8, dtype=np.float32)
+            vector[len(vectors)] = 1.0
+            vectors[key] = vector
+        return vectors[key]
+    
+    monkeypatch.setattr(bot.semantic_cache, "embed", embed)
+    return bot
+
+
+def prepare(bot, user_input):
+    return agent._run_coroutine(bot._prepare_turn(user_input))
+
+
+def answer(bot, user_input, response):
+    turn = prepare(bot, user_input)
+    bot._remember(user_input, response, turn)
+    bot._wait_for_pending_write()
+    return turn
+
+
+def test_repeated_question_hits_semantic_cache(bot):
+    answer(bot, "Explain photosynthesis", "Plants turn light into sugar.")
+    answer(bot, "Explain gravity", "Masses attract each other.")
+    
+    # The recent conversation has moved on, but the question stands on its own
+    assert prepare(bot, "Explain photosynthesis").cached_response == "Plants turn light into sugar."
+
+
+def test_cache_is_keyed_on_settings(bot):
+    answer(bot, "Explain photosynthesis", "Plants turn light into sugar.")
+    bot.set_eli5_mode(True)
+    assert prepare(bot, "Explain photosynthesis").cached_response is None
+
+
+def test_follow_ups_skip_semantic_cache(bot):
+    answer(bot, "Explain photosynthesis", "Plants turn light into sugar.")
+    turn = answer(bot, "Explain it in more detail", "Chlorophyll absorbs light...")
+    assert turn.query_embedding is None
+    assert prepare(bot, "Explain it in more detail").cached_response is None
+
+
+def test_quizzes_skip_semantic_cache(bot):
+    answer(bot, "Quiz me on fractions", "Question 1: ...")
+    turn = prepare(bot, "Quiz me on fractions")
+    assert turn.query_embedding is None
+    assert turn.cached_response is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_a_burst_then_paces(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(agent.time, "monotonic", clock)
+    bucket = agent.TokenBucket(rate=2.0, capacity=3, max_wait=10.0)
+    
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)  # Queued behind the previous reservation
+    
+    clock.now += 10  # Refills, but never past capacity
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() > 0
+
+
+def test_token_bucket_lets_long_waits_through(monkeypatch):
+    monkeypatch.setattr(agent.time, "monotonic", FakeClock())
+    bucket = agent.TokenBucket(rate=0.1, capacity=1, max_wait=5.0)
+    
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0  # A 10 second wait is over max_wait, so no token is taken
+    assert agent.TokenBucket(rate=0, capacity=1, max_wait=0).reserve() == 0.0
+
+
+class FakeApiError(Exception):
+    def __init__(self, message, retry_after=None, details=None):
+        super().__init__(message)
+        if retry_after is not None:
+            self.retry_after = retry_after
+        self.details = details
+
+
+@pytest.mark.parametrize("error, expected", [
+    (FakeApiError("429", retry_after="7"), 7.0),
+    (FakeApiError("429", details={"retryDelay": "12s"}), 12.0),
+    (FakeApiError("429 RESOURCE_EXHAUSTED. Please retry in 12.5s."), 12.5),
+    (FakeApiError("429", retry_after="soon", details="'retry_delay': '3s'"), 3.0),
+    (FakeApiError("500 internal error"), None),
+])
+def test_retry_after_seconds(error, expected):
+    assert agent._retry_after_seconds(error) == expected
+
+
+@pytest.mark.parametrize("kind, template", sorted(agent.PROMPT_TEMPLATES.items()))
+def test_generated_prompt_builders_match_template_substitute(kind, template):
+    build = agent._compile_template(kind, template)
+    for args in [("", "", ""), ("Human: hi\nAssistant: hello", "\n\nRelevant: $5 {x} \\n", "Costs $$ and ${y}?")]:
+        context, tool_results, user_input = args
+        assert build(*args) == template.substitute(context=context, tool_results=tool_results, user_input=user_input)
+
+
+def test_generated_prompt_builder_handles_escaped_dollars():
+    template = Template("$$5 for $user_input$$")
+    build = agent._compile_template("test", template)
+    assert build("", "", "tea") == template.substitute(context="", tool_results="", user_input="tea")
+
+
+CLASSIFY_SAMPLES = [
+    "Quiz me on world capitals",
+    "Create flashcards for photosynthesis",
+    "Find videos about black holes on YouTube",
+    "What is 456 * 789?",
+    "Tell me about the French Revolution",
+    "EXPLAIN quantum physics and test me",
+    "Héllo, ünïcode with a tutorial video",
+    "hello there",
+    "",
+]
+
+
+def automaton_bits(automaton, lower):
+    bits = 0
+    for _, mask in automaton.iter(lower):
+        bits |= mask
+    return bits
+
+
+def test_keyword_automaton_matches_plain_scan():
+    pytest.importorskip("ahocorasick")
+    automaton = agent._build_keyword_automaton()
+    for text in CLASSIFY_SAMPLES:
+        assert automaton_bits(automaton, text.lower()) == keyword_bits(text.lower()), text
+
+
+def test_numba_scanner_matches_plain_scan(monkeypatch):
+    pytest.importorskip("numba")
+    from numba import njit
+    from numba.typed import List as NumbaList
+    monkeypatch.setattr(agent, "np", np)
+    monkeypatch.setattr(agent, "njit", njit)
+    monkeypatch.setattr(agent, "NumbaList", NumbaList, raising=False)
+    
+    scan, keywords, masks = agent._build_numba_classifier()
+    for text in CLASSIFY_SAMPLES:
+        buf = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+        assert int(scan(buf, keywords, masks)) == keyword_bits(text.lower()), text
+
+
+def test_hyperscan_arithmetic_check_matches_regex(monkeypatch):
+    hyperscan = pytest.importorskip("hyperscan")
+    monkeypatch.setattr(agent, "hyperscan", hyperscan)
+    monkeypatch.setattr(agent, "CALC_DATABASE", agent._build_calc_database())
+    assert agent.CALC_DATABASE is not None
+    for text in CLASSIFY_SAMPLES + ["2+2", "10 ^ 3 please", "no numbers - here"]:
+        assert agent._has_arithmetic(text) == bool(agent.CALC_RE.search(text)), text
+
+
+def test_classify_flags(bot):
+    flags = bot._classify("Quiz me on 2 + 2", "quiz me on 2 + 2")
+    assert flags == agent.Flags(quiz=True, flash=False, video=False, calc=True, search=False)
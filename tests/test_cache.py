@@ -0,0 +1,67 @@
+"""
+Tests for the semantic response cache and the tool-result caches in cache.py.
+"""
+
+import numpy as np
+import pytest
+
+import cache
+from cache import SemanticCache, TTLCache
+
+
+def unit(i, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+@pytest.fixture
+def semantic_cache():
+    return SemanticCache("test-session")
+
+
+def test_semantic_cache_hits_similar_queries_in_the_same_context(semantic_cache):
+    semantic_cache.add(unit(0), "ctx", "cached answer")
+    
+    near = unit(0) + 0.05 * unit(1)
+    assert semantic_cache.lookup(near / np.linalg.norm(near), "ctx") == "cached answer"
+    assert semantic_cache.lookup(unit(1), "ctx") is None  # Different question
+    assert semantic_cache.lookup(unit(0), "other") is None  # Different context
+    assert semantic_cache.lookup(None, "ctx") is None  # Cache unavailable
+
+
+def test_semantic_cache_entries_expire(semantic_cache, monkeypatch):
+    semantic_cache.ttl = 10
+    semantic_cache.add(unit(0), "ctx", "cached answer")
+    
+    now = cache.time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 11)
+    assert semantic_cache.lookup(unit(0), "ctx") is None
+    assert len(semantic_cache) == 0
+
+
+def test_semantic_cache_evicts_least_recently_used(semantic_cache):
+    semantic_cache.max_entries = 2
+    semantic_cache.add(unit(0), "ctx", "zero")
+    semantic_cache.add(unit(1), "ctx", "one")
+    semantic_cache.lookup(unit(0), "ctx")  # "one" is now the least recently used
+    semantic_cache.add(unit(2), "ctx", "two")
+    
+    assert semantic_cache.lookup(unit(0), "ctx") == "zero"
+    assert semantic_cache.lookup(unit(1), "ctx") is None
+    assert semantic_cache.lookup(unit(2), "ctx") == "two"
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    tool_cache = TTLCache("test", maxsize=2, ttl=60)
+    tool_cache.set("a", "A")
+    tool_cache.set("b", "B")
+    tool_cache.get("a")
+    tool_cache.set("c", "C")  # Evicts "b", the least recently used
+    
+    assert tool_cache.get("b") is None
+    assert tool_cache.get("a") == "A"
+    now[0] += 61
+    assert tool_cache.get("a") is None
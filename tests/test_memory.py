@@ -0,0 +1,92 @@
+"""
+Tests for the chat history persistence in memory.py.
+"""
+
+import os
+
+import pytest
+
+import memory
+from memory import ChatHistoryManager, ConversationMemory
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    """Point every history manager at a fresh directory."""
+    monkeypatch.setattr(memory, "CHAT_HISTORY_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_clear_then_append_reloads_only_new_turns():
+    conversation = ConversationMemory("session")
+    conversation.add_interaction("first question", "first answer")
+    conversation.flush()
+    
+    conversation.clear()
+    conversation.add_interaction("second question", "second answer")
+    conversation.flush()
+    
+    reloaded = ConversationMemory("session", persist=False)
+    assert reloaded.get_messages() == [
+        {"role": "user", "content": "second question"},
+        {"role": "assistant", "content": "second answer"},
+    ]
+    assert ChatHistoryManager().get_all_conversations()[0]["message_count"] == 2
+
+
+def test_clear_drops_pending_turns():
+    conversation = ConversationMemory("session")
+    conversation.add_interaction("question", "answer")  # Not saved yet: the save is debounced
+    
+    conversation.clear()
+    conversation.flush()
+    
+    assert ConversationMemory("session", persist=False).get_messages() == []
+
+
+def test_clear_leaves_unsaved_session_out_of_history():
+    conversation = ConversationMemory("session")
+    conversation.add_interaction("question", "answer")  # Not saved yet
+    
+    conversation.clear()
+    
+    assert ChatHistoryManager().get_all_conversations() == []
+
+
+def test_rebuilt_index_keeps_created_at():
+    manager = ChatHistoryManager()
+    manager.append_messages("session", [{"role": "user", "content": "hello"}])
+    created_at = manager.get_all_conversations()[0]["created_at"]
+    manager.append_messages("session", [{"role": "assistant", "content": "hi"}])
+    
+    os.remove(manager.index_path)
+    memory._index_cache.clear()
+    
+    [summary] = ChatHistoryManager().get_all_conversations()
+    assert summary["created_at"] == created_at
+    assert summary["message_count"] == 2
+    assert ChatHistoryManager().load_conversation("session")["messages"] == [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+    ]
+
+
+def test_list_page_walks_every_conversation_newest_first():
+    manager = ChatHistoryManager()
+    for i in range(25):
+        manager.save_conversation(f"session-{i:02d}", [{"role": "user", "content": f"question {i}"}])
+    
+    pages, cursor = [], None
+    while True:
+        page, cursor = manager.list_page(cursor, limit=10)
+        pages.append([c["session_id"] for c in page])
+        if cursor is None:
+            break
+    
+    assert [len(page) for page in pages] == [10, 10, 5]
+    listed = [session_id for page in pages for session_id in page]
+    by_id = {c["session_id"]: c for c in manager.get_all_conversations()}
+    assert sorted(listed) == sorted(by_id)
+    keys = [(by_id[s]["updated_at"], s) for s in listed]
+    assert keys == sorted(keys, reverse=True)
+    assert listed[0] == "session-24"
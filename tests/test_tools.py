@@ -0,0 +1,35 @@
+"""
+Tests for the calculator and result formatting in tools.py.
+"""
+
+import pytest
+
+import tools
+
+
+@pytest.mark.parametrize("expression, result", [
+    ("2 + 3 * 4", "14"),
+    ("2^10", "1024"),
+    ("-(3 - 5)", "2"),
+    ("7 / 2", "3.5"),
+    ("6 / 3", "2"),
+    ("50%", "0.5"),
+])
+def test_calculate(expression, result):
+    assert tools.calculate(expression).endswith(f"= **{result}**")
+
+
+def test_calculate_repeats_use_the_parse_cache():
+    tools._evaluate.cache_clear()
+    tools.calculate("12 * 12")
+    tools.calculate("12 * 12")
+    assert tools._evaluate.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("expression, error", [
+    ("1 / 0", "Division by zero"),
+    ("__import__('os')", "Invalid characters"),
+    ("2 +", "Error calculating"),
+])
+def test_calculate_errors(expression, error):
+    assert error in tools.calculate(expression)
@@ -6,9 +6,114 @@ flashcards, YouTube search, and calculator functionality.
 
 import wikipedia
 from duckduckgo_search import DDGS
-from typing import Optional, List, Dict
+from typing import Optional, Dict
+import ast
+import atexit
+import functools
+import importlib
+import operator
 import re
-import json
+import threading
+
+from config import BOT_NAME, HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS
+
+# Optional dependency - faster parsing of Wikipedia API responses
+orjson = None
+try:
+    import orjson
+except ImportError:
+    pass
+
+
+def _create_http_session():
+    """
+    Create the connection pool shared by all tool calls.
+    
+    Uses httpx (HTTP/2 when the `h2` extra is installed) and falls back to a
+    pooled requests.Session. Both expose a compatible `get(url, params, headers)`.
+    """
+    headers = {"User-Agent": f"{BOT_NAME}/1.0"}
+    try:
+        import httpx
+        limits = httpx.Limits(
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS // 2,
+            max_connections=HTTP_MAX_CONNECTIONS
+        )
+        try:
+            return httpx.Client(http2=True, timeout=HTTP_TIMEOUT, limits=limits,
+                                headers=headers, follow_redirects=True)
+        except ImportError:
+            return httpx.Client(timeout=HTTP_TIMEOUT, limits=limits,
+                                headers=headers, follow_redirects=True)
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers.update(headers)
+        session.mount("https://", HTTPAdapter(pool_maxsize=HTTP_MAX_CONNECTIONS))
+        return session
+
+
+SHARED_HTTP = _create_http_session()
+atexit.register(SHARED_HTTP.close)
+
+
+class _OrjsonTransport:
+    """Forwards `get` to the shared pool; responses parse their JSON bodies with orjson."""
+    
+    def __init__(self, session):
+        self._session = session
+    
+    def get(self, *args, **kwargs):
+        response = self._session.get(*args, **kwargs)
+        # Parse the raw bytes directly, skipping the text decode
+        response.json = lambda: orjson.loads(response.content)
+        return response
+
+
+# The wikipedia package sends every API call through `requests.get(API_URL, ...)`.
+# Route those calls through the shared pool, and skip its http -> https redirect.
+_wikipedia_api = importlib.import_module("wikipedia.wikipedia")
+_wikipedia_api.requests = _OrjsonTransport(SHARED_HTTP) if orjson is not None else SHARED_HTTP
+_wikipedia_api.API_URL = _wikipedia_api.API_URL.replace("http://", "https://", 1)
+
+
+def _extract_params(sentences: int) -> Dict:
+    params = {'prop': 'extracts', 'explaintext': ''}
+    if sentences:
+        params['exsentences'] = sentences
+    else:
+        params['exintro'] = ''
+    return params
+
+
+def _wikipedia_summary(title: str, sentences: int) -> str:
+    """
+    Format the summary of one article.
+    
+    The extract, URL and disambiguation flag come back from a single API
+    request. Disambiguation and missing pages go through `wikipedia.page`,
+    which raises the errors `search_wikipedia` handles.
+    """
+    params = _extract_params(sentences)
+    params.update({
+        'prop': 'extracts|info|pageprops',
+        'inprop': 'url',
+        'ppprop': 'disambiguation',
+        'redirects': '',
+        'titles': title,
+    })
+    pages = _wikipedia_api._wiki_request(params).get('query', {}).get('pages', {})
+    for page in pages.values():
+        if 'missing' not in page and 'pageprops' not in page and 'extract' in page:
+            return f"📚 **{page['title']}**\n\n{page['extract']}\n\n🔗 Source: {page['fullurl']}"
+    
+    # Let the library raise DisambiguationError / PageError, or fetch the extract for the page it finds
+    page = wikipedia.page(title, auto_suggest=False)
+    params = _extract_params(sentences)
+    params['titles'] = page.title
+    summary = _wikipedia_api._wiki_request(params)['query']['pages'][page.pageid]['extract']
+    return f"📚 **{page.title}**\n\n{summary}\n\n🔗 Source: {page.url}"
 
 
 def search_wikipedia(query: str, sentences: int = 3) -> str:
@@ -32,16 +137,12 @@ def search_wikipedia(query: str, sentences: int = 3) -> str:
         # Try to get the page summary
         for title in search_results:
             try:
-                page = wikipedia.page(title, auto_suggest=False)
-                summary = wikipedia.summary(title, sentences=sentences, auto_suggest=False)
-                return f"📚 **{page.title}**\n\n{summary}\n\n🔗 Source: {page.url}"
+                return _wikipedia_summary(title, sentences)
             except wikipedia.DisambiguationError as e:
                 # Try the first option from disambiguation
                 if e.options:
                     try:
-                        summary = wikipedia.summary(e.options[0], sentences=sentences, auto_suggest=False)
-                        page = wikipedia.page(e.options[0], auto_suggest=False)
-                        return f"📚 **{page.title}**\n\n{summary}\n\n🔗 Source: {page.url}"
+                        return _wikipedia_summary(e.options[0], sentences)
                     except:
                         continue
             except wikipedia.PageError:
@@ -53,6 +154,20 @@ def search_wikipedia(query: str, sentences: int = 3) -> str:
         return f"Error searching Wikipedia: {str(e)}"
 
 
+# DuckDuckGo clients, one per thread: DDGS is not documented as thread-safe, and
+# tool calls run on a reused thread pool, so each thread's connection stays warm
+_ddgs_local = threading.local()
+
+
+def _get_ddgs():
+    """Return this thread's DDGS client, creating it on first use."""
+    ddgs = getattr(_ddgs_local, "client", None)
+    if ddgs is None:
+        ddgs = _ddgs_local.client = DDGS()
+        atexit.register(ddgs.__exit__, None, None, None)
+    return ddgs
+
+
 def search_web(query: str, max_results: int = 3) -> str:
     """
     Search the web using DuckDuckGo.
@@ -65,24 +180,17 @@ def search_web(query: str, max_results: int = 3) -> str:
         Formatted search results
     """
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
+        results = list(_get_ddgs().text(query, max_results=max_results))
         
         if not results:
             return f"No web results found for '{query}'."
         
-        formatted_results = ["🌐 **Web Search Results:**\n"]
-        
-        for i, result in enumerate(results, 1):
-            title = result.get("title", "No title")
-            body = result.get("body", "No description")
-            url = result.get("href", "")
-            
-            formatted_results.append(f"**{i}. {title}**")
-            formatted_results.append(f"{body}")
-            if url:
-                formatted_results.append(f"🔗 {url}")
-            formatted_results.append("")
+        # One block per result; the trailing newline leaves a blank line between results
+        formatted_results = ["🌐 **Web Search Results:**\n"] + [
+            f"**{i}. {result.get('title', 'No title')}**\n{result.get('body', 'No description')}\n"
+            + (f"🔗 {result['href']}\n" if result.get("href") else "")
+            for i, result in enumerate(results, 1)
+        ]
         
         return "\n".join(formatted_results)
         
@@ -103,25 +211,17 @@ def search_youtube_videos(query: str, max_results: int = 3) -> str:
     """
     try:
         search_query = f"{query} educational tutorial"
-        with DDGS() as ddgs:
-            results = list(ddgs.videos(search_query, max_results=max_results))
+        results = list(_get_ddgs().videos(search_query, max_results=max_results))
         
         if not results:
             return f"No educational videos found for '{query}'."
         
-        formatted_results = ["🎬 **Educational Videos:**\n"]
-        
-        for i, video in enumerate(results, 1):
-            title = video.get("title", "No title")
-            publisher = video.get("publisher", "Unknown")
-            duration = video.get("duration", "")
-            url = video.get("content", "")
-            
-            formatted_results.append(f"**{i}. {title}**")
-            formatted_results.append(f"   📺 {publisher} | ⏱️ {duration}")
-            if url:
-                formatted_results.append(f"   ▶️ Watch: {url}")
-            formatted_results.append("")
+        formatted_results = ["🎬 **Educational Videos:**\n"] + [
+            f"**{i}. {video.get('title', 'No title')}**\n"
+            f"   📺 {video.get('publisher', 'Unknown')} | ⏱️ {video.get('duration', '')}\n"
+            + (f"   ▶️ Watch: {video['content']}\n" if video.get("content") else "")
+            for i, video in enumerate(results, 1)
+        ]
         
         return "\n".join(formatted_results)
         
@@ -129,6 +229,40 @@ def search_youtube_videos(query: str, max_results: int = 3) -> str:
         return f"Error searching videos: {str(e)}"
 
 
+# Deleting every allowed character leaves only what the calculator rejects (besides whitespace)
+CALC_ALLOWED_CHARS = "0123456789+-*/().^ %"
+_CALC_DELETE_ALLOWED = str.maketrans("", "", CALC_ALLOWED_CHARS)
+
+# Define safe operations
+CALC_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+def _eval_expr(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    elif isinstance(node, ast.BinOp):
+        return CALC_OPERATORS[type(node.op)](_eval_expr(node.left), _eval_expr(node.right))
+    elif isinstance(node, ast.UnaryOp):
+        return CALC_OPERATORS[type(node.op)](_eval_expr(node.operand))
+    else:
+        raise ValueError(f"Unsupported operation")
+
+
+@functools.lru_cache(maxsize=256)
+def _evaluate(expression: str):
+    """Parse and evaluate a cleaned expression; repeats skip the parse and tree walk."""
+    tree = ast.parse(expression, mode='eval')
+    return _eval_expr(tree.body)
+
+
 def calculate(expression: str) -> str:
     """
     Perform mathematical calculations safely.
@@ -144,8 +278,8 @@ def calculate(expression: str) -> str:
         expression = expression.strip()
         
         # Remove any potentially dangerous characters
-        allowed_chars = set("0123456789+-*/().^ %")
-        if not all(c in allowed_chars or c.isspace() for c in expression):
+        rejected = expression.translate(_CALC_DELETE_ALLOWED)
+        if rejected and not rejected.isspace():
             return "Error: Invalid characters in expression. Only numbers and basic operators (+, -, *, /, ^, %) are allowed."
         
         # Replace common math notations
@@ -153,34 +287,7 @@ def calculate(expression: str) -> str:
         expression = expression.replace("%", "/100")
         
         # Safely evaluate
-        import ast
-        import operator
-        
-        # Define safe operations
-        operators = {
-            ast.Add: operator.add,
-            ast.Sub: operator.sub,
-            ast.Mult: operator.mul,
-            ast.Div: operator.truediv,
-            ast.Pow: operator.pow,
-            ast.USub: operator.neg,
-            ast.UAdd: operator.pos,
-        }
-        
-        def eval_expr(node):
-            if isinstance(node, ast.Num):
-                return node.n
-            elif isinstance(node, ast.Constant):
-                return node.value
-            elif isinstance(node, ast.BinOp):
-                return operators[type(node.op)](eval_expr(node.left), eval_expr(node.right))
-            elif isinstance(node, ast.UnaryOp):
-                return operators[type(node.op)](eval_expr(node.operand))
-            else:
-                raise ValueError(f"Unsupported operation")
-        
-        tree = ast.parse(expression, mode='eval')
-        result = eval_expr(tree.body)
+        result = _evaluate(expression)
         
         # Format result nicely
         if isinstance(result, float) and result.is_integer():
@@ -223,26 +330,16 @@ def generate_flashcards(topic: str, num_cards: int = 5) -> str:
     return f"""GENERATE_FLASHCARDS:{topic}:{num_cards}"""
 
 
-def generate_mermaid_diagram(topic: str, diagram_type: str = "flowchart") -> Optional[str]:
-    """
-    Generate a Mermaid diagram code for educational topics.
-    
-    Args:
-        topic: The topic to create a diagram for
-        diagram_type: Type of diagram (flowchart, mindmap, sequence)
-    
-    Returns:
-        Mermaid diagram code or None
-    """
-    templates = {
-        "flowchart": f"""```mermaid
+# Diagram skeletons, filled in with str.format
+MERMAID_TEMPLATES = {
+    "flowchart": """```mermaid
 flowchart TD
     A[Start: {topic}] --> B[Step 1]
     B --> C[Step 2]
     C --> D[Step 3]
     D --> E[End Result]
 ```""",
-        "mindmap": f"""```mermaid
+    "mindmap": """```mermaid
 mindmap
     root(({topic}))
         Concept 1
@@ -254,7 +351,7 @@ mindmap
         Concept 3
             Detail E
 ```""",
-        "sequence": f"""```mermaid
+    "sequence": """```mermaid
 sequenceDiagram
     participant User
     participant System
@@ -262,9 +359,44 @@ sequenceDiagram
     System->>System: Process
     System->>User: Response
 ```"""
-    }
+}
+
+
+def generate_mermaid_diagram(topic: str, diagram_type: str = "flowchart") -> Optional[str]:
+    """
+    Generate a Mermaid diagram code for educational topics.
     
-    return templates.get(diagram_type, templates["flowchart"])
+    Args:
+        topic: The topic to create a diagram for
+        diagram_type: Type of diagram (flowchart, mindmap, sequence)
+    
+    Returns:
+        Mermaid diagram code or None
+    """
+    template = MERMAID_TEMPLATES.get(diagram_type, MERMAID_TEMPLATES["flowchart"])
+    return template.format(topic=topic)
+
+
+# Common words left out of keywords
+KEYWORD_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare',
+    'ought', 'used', 'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by',
+    'from', 'as', 'into', 'through', 'during', 'before', 'after', 'above',
+    'below', 'between', 'under', 'again', 'further', 'then', 'once', 'here',
+    'there', 'when', 'where', 'why', 'how', 'all', 'each', 'few', 'more',
+    'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own',
+    'same', 'so', 'than', 'too', 'very', 'just', 'and', 'but', 'if', 'or',
+    'because', 'until', 'while', 'although', 'though', 'what', 'which',
+    'who', 'whom', 'this', 'that', 'these', 'those', 'am', 'i', 'you',
+    'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them',
+    'my', 'your', 'his', 'its', 'our', 'their', 'mine', 'yours', 'hers',
+    'ours', 'theirs', 'about', 'tell', 'know', 'get', 'got', 'like'
+})
+
+# Words of three or more letters; shorter words are never keywords
+_KEYWORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
 
 
 def extract_keywords(text: str) -> list:
@@ -277,39 +409,16 @@ def extract_keywords(text: str) -> list:
     Returns:
         List of keywords
     """
-    # Remove common words and extract nouns/proper nouns
-    stop_words = {
-        'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-        'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-        'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare',
-        'ought', 'used', 'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by',
-        'from', 'as', 'into', 'through', 'during', 'before', 'after', 'above',
-        'below', 'between', 'under', 'again', 'further', 'then', 'once', 'here',
-        'there', 'when', 'where', 'why', 'how', 'all', 'each', 'few', 'more',
-        'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own',
-        'same', 'so', 'than', 'too', 'very', 'just', 'and', 'but', 'if', 'or',
-        'because', 'until', 'while', 'although', 'though', 'what', 'which',
-        'who', 'whom', 'this', 'that', 'these', 'those', 'am', 'i', 'you',
-        'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them',
-        'my', 'your', 'his', 'its', 'our', 'their', 'mine', 'yours', 'hers',
-        'ours', 'theirs', 'about', 'tell', 'know', 'get', 'got', 'like'
-    }
-    
-    # Clean text and split into words
-    words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-    
-    # Filter out stop words and short words
-    keywords = [w for w in words if w not in stop_words and len(w) > 2]
+    # Scan words lazily, skipping stop words and repeats, until there are enough
+    unique_keywords = {}  # Ordered, so it also preserves first-seen order
+    for match in _KEYWORD_RE.finditer(text.lower()):
+        word = match.group()
+        if word not in KEYWORD_STOP_WORDS:
+            unique_keywords[word] = None
+            if len(unique_keywords) == 10:  # Return top 10 keywords
+                break
     
-    # Return unique keywords (preserving order)
-    seen = set()
-    unique_keywords = []
-    for k in keywords:
-        if k not in seen:
-            seen.add(k)
-            unique_keywords.append(k)
-    
-    return unique_keywords[:10]  # Return top 10 keywords
+    return list(unique_keywords)
 
 
 # Subject areas for educational focus
@@ -324,6 +433,62 @@ SUBJECT_AREAS = {
     "art": {"name": "Art & Music", "icon": "🎨", "color": "#f97316"},
 }
 
+# Sidebar labels for the subject selector, built once per process
+SUBJECT_OPTIONS = {key: f"{val['icon']} {val['name']}" for key, val in SUBJECT_AREAS.items()}
+SUBJECT_OPTION_KEYS = list(SUBJECT_OPTIONS)
+
+# Example prompts shown on the welcome screen, by subject
+SUBJECT_SUGGESTIONS = {
+    "general": [
+        "Quiz me on world capitals",
+        "Explain quantum physics",
+        "Create flashcards for photosynthesis",
+        "Find videos about black holes"
+    ],
+    "math": [
+        "Calculate 456 * 789",
+        "Explain the Pythagorean theorem",
+        "Quiz me on fractions",
+        "Create flashcards for algebra"
+    ],
+    "science": [
+        "Explain how DNA works",
+        "Quiz me on the periodic table",
+        "Create flashcards for chemistry",
+        "Find videos about evolution"
+    ],
+    "history": [
+        "Tell me about World War 2",
+        "Quiz me on ancient Rome",
+        "Create flashcards for US presidents",
+        "Find videos about the Renaissance"
+    ],
+    "literature": [
+        "Explain Shakespeare's themes",
+        "Quiz me on literary devices",
+        "Create flashcards for poetry terms",
+        "Who wrote To Kill a Mockingbird?"
+    ],
+    "programming": [
+        "Explain what is an API",
+        "Quiz me on Python basics",
+        "Create flashcards for data structures",
+        "Find videos about machine learning"
+    ],
+    "geography": [
+        "Name the longest river",
+        "Quiz me on countries",
+        "Create flashcards for continents",
+        "Find videos about climate zones"
+    ],
+    "art": [
+        "Who painted the Mona Lisa?",
+        "Quiz me on art movements",
+        "Create flashcards for music theory",
+        "Find videos about impressionism"
+    ]
+}
+
 
 # Tool descriptions for the LangChain agent
 TOOL_DESCRIPTIONS = {